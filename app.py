@@ -4,15 +4,55 @@ A tool to help job applicants create tailored cover letters based on their CV an
 """
 
 import streamlit as st
+import json
 import os
+import time
+import uuid
+from collections import deque
+from io import BytesIO
 from dotenv import load_dotenv
-from pdf_utils import extract_text_from_pdf, validate_pdf_content
-from cover_letter_agent import CoverLetterAgent
-from pdf_generator import create_cover_letter_pdf, format_filename
+from config import JOB_STORE_PATH
+from instrumentation import bind_trace, registry
+import jobs
+from lazy_imports import lazy_module, prewarm
+
+# PDF, LangChain/OpenAI and reportlab subsystems load on first use (see lazy_imports)
+pdf_utils = lazy_module("pdf_utils")
+cover_letter_agent = lazy_module("cover_letter_agent")
+relevance = lazy_module("relevance")
+pdf_generator = lazy_module("pdf_generator")
+token_budget = lazy_module("token_budget")
+job_index = lazy_module("job_index")
+job_store = lazy_module("job_store")
+rate_limiter = lazy_module("rate_limiter")
+
+# Background import order after the first render: most likely first use first
+PREWARM_MODULES = ["pdf_utils", "relevance", "job_index", "cover_letter_agent", "token_budget", "pdf_generator", "job_store"]
+
+# Keys of pdf_generator.PAGE_SIZES, listed here so the sidebar renders without reportlab
+PAGE_SIZE_OPTIONS = ["Letter", "A4"]
 
 # Load environment variables
 load_dotenv()
 
+# Number of recent stage timings kept per session for the diagnostics panel
+DIAGNOSTICS_MAX_SPANS = 50
+
+# Number of generated letters kept per session for bulk export
+LETTER_HISTORY_MAX = 50
+
+# Background jobs a session may have in flight, letter variants included, and how
+# often their status is refreshed
+MAX_JOBS_PER_SESSION = 8
+JOB_POLL_SECONDS = 1.0
+
+# Most letter variants generated side by side in one go, and the columns per row
+MAX_VARIANTS = 8
+VARIANT_COLUMNS = 3
+
+# Imported postings listed in the picker per search
+IMPORTED_POSTINGS_SHOWN = 20
+
 # Page configuration
 st.set_page_config(
     page_title="CoverCraft AI - Job Application Helper",
@@ -234,6 +274,20 @@ def initialize_session_state():
         st.session_state.cover_letter = ""
     if 'cv_score' not in st.session_state:
         st.session_state.cv_score = None
+    if 'pdf_ready_hash' not in st.session_state:
+        st.session_state.pdf_ready_hash = None
+    if 'letter_history' not in st.session_state:
+        st.session_state.letter_history = deque(maxlen=LETTER_HISTORY_MAX)
+    if 'history_zip' not in st.session_state:
+        st.session_state.history_zip = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = {}
+    if 'variant_jobs' not in st.session_state:
+        st.session_state.variant_jobs = []
+    if 'diagnostics_spans' not in st.session_state:
+        st.session_state.diagnostics_spans = deque(maxlen=DIAGNOSTICS_MAX_SPANS)
     if 'api_key_set' not in st.session_state:
         # Check if API key is available in Streamlit secrets (for cloud deployment) or environment variables (for local)
         try:
@@ -247,12 +301,499 @@ def initialize_session_state():
         
         st.session_state.api_key_set = bool(api_key and api_key != "your_openai_api_key_here")
 
+def budgeted_inputs(agent):
+    """
+    Fit the session's CV and job description to the input token budget.
+    
+    With the compact CV profile enabled, the cached CV digest is sent in
+    place of the raw CV text when it is shorter. Shows the token counts before
+    and after compaction.
+    
+    Args:
+        agent (CoverLetterAgent): Agent whose model is used for counting
+        
+    Returns:
+        tuple: (cv_text, job_description) ready to send to the model
+    """
+    with st.spinner("🗜️ Summarizing your CV (once per CV)..."):
+        cv_text, job_description, report = agent.prepare_inputs(
+            st.session_state.cv_text,
+            st.session_state.job_description,
+            use_digest=st.session_state.get("use_cv_digest", True)
+        )
+    
+    digest = report["digest"]
+    if digest and digest["used"]:
+        st.caption(f"🗜️ Using your compact CV profile: {digest['profile_tokens']:,} tokens instead of {digest['cv_tokens']:,}")
+    elif digest:
+        st.caption(f"🗜️ Your CV ({digest['cv_tokens']:,} tokens) is already shorter than its profile ({digest['profile_tokens']:,}), so it is sent as is")
+    
+    before, after = report["before"], report["after"]
+    if report["compacted"]:
+        st.caption(
+            f"🧮 Inputs compacted to fit the {report['budget']:,}-token budget: "
+            f"CV {before['cv_content']:,} → {after['cv_content']:,}, "
+            f"job description {before['job_description']:,} → {after['job_description']:,}, "
+            f"total {before['total']:,} → {after['total']:,} tokens"
+        )
+    else:
+        st.caption(f"🧮 Input tokens: {after['total']:,} (budget {report['budget']:,})")
+    
+    return cv_text, job_description
+
+def background_inputs(agent):
+    """
+    Get the inputs of a background job, which prepares them in its worker.
+    
+    Summarizing the CV is an LLM call, so the CV profile and the token budget
+    are applied inside the job; only the raw token count is shown here.
+    
+    Args:
+        agent (CoverLetterAgent): Agent whose model is used for counting
+        
+    Returns:
+        dict: cv_content, job_description and use_digest arguments for the job functions
+    """
+    cv_text = st.session_state.cv_text
+    job_description = st.session_state.job_description
+    use_digest = st.session_state.get("use_cv_digest", True)
+    
+    total = token_budget.count_tokens(cv_text, agent.model) + token_budget.count_tokens(job_description, agent.model)
+    detail = "the compact CV profile and budget are applied in the background" if use_digest else "the budget is applied in the background"
+    st.caption(f"🧮 Input tokens: {total:,} before compaction; {detail}")
+    
+    return {"cv_content": cv_text, "job_description": job_description, "use_digest": use_digest}
+
+def index_analysis(job_description=None, cv_text=None, **analysis):
+    """
+    Save results for a job description so near-duplicate postings can reuse them.
+    
+    Args:
+        job_description (str): Job description the results are for (defaults to the session's)
+        cv_text (str): CV the results are for (defaults to the session's)
+        **analysis: cv_score=... and/or cover_letter=...
+    """
+    job_description = job_description or st.session_state.job_description
+    cv_text = cv_text or st.session_state.cv_text
+    index = job_index.get_job_index()
+    if index is None or not job_description or not cv_text:
+        return
+    
+    try:
+        index.add(job_description, job_index.text_hash(cv_text), **analysis)
+    except Exception as e:
+        st.warning(f"⚠️ Could not save this analysis for reuse: {str(e)}")
+
+def render_near_duplicate(job_description):
+    """
+    Offer the results of an earlier, near-identical posting analyzed with the same CV.
+    
+    Args:
+        job_description (str): Job description entered by the user
+    """
+    index = job_index.get_job_index()
+    if index is None:
+        return
+    
+    match = index.find(job_description, job_index.text_hash(st.session_state.cv_text))
+    if match is None:
+        return
+    
+    analysis = match["analysis"]
+    previous_score = analysis.get("cv_score")
+    previous_letter = analysis.get("cover_letter")
+    
+    # Nothing to offer if those results are already on the page
+    if previous_score in (None, st.session_state.cv_score) and previous_letter in (None, st.session_state.cover_letter):
+        return
+    
+    seen = time.strftime("%Y-%m-%d", time.localtime(match["updated_at"]))
+    st.info(
+        f"🔁 This posting is {match['similarity']:.0%} similar to one you analyzed on {seen}: "
+        f"“{match['preview']}…”"
+    )
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        if previous_score and st.button("♻️ Reuse Previous Analysis", use_container_width=True):
+            st.session_state.cv_score = previous_score
+            st.rerun()
+    with col2:
+        if previous_letter and st.button("♻️ Reuse Previous Letter", use_container_width=True):
+            st.session_state.cover_letter = previous_letter
+            st.rerun()
+
+def render_imported_postings():
+    """Let the user pick a posting ingested with job_store.py as the job description."""
+    # Checked before touching job_store so the first paint imports nothing extra
+    if not os.path.isfile(JOB_STORE_PATH):
+        return
+    store = job_store.get_job_store()
+    if store is None:
+        return
+    
+    with st.expander(f"📥 Imported Postings ({len(store):,})"):
+        query = st.text_input("Search titles and descriptions", key="posting_search")
+        postings = store.search(query, limit=IMPORTED_POSTINGS_SHOWN)
+        if not postings:
+            st.caption("No imported postings match this search.")
+            return
+        
+        choice = st.selectbox(
+            "Posting",
+            range(len(postings)),
+            format_func=lambda i: postings[i]["title"] or postings[i]["job_id"]
+        )
+        if st.button("📋 Use This Posting", use_container_width=True):
+            st.session_state.job_description_input = postings[choice]["description"]
+            st.rerun()
+
+def remember_letter(cover_letter, tone):
+    """
+    Add a generated cover letter to the session's letter history.
+    
+    Args:
+        cover_letter (str): Generated cover letter
+        tone (str): Name of the tone it was written in
+    """
+    history = st.session_state.letter_history
+    if history and history[-1]["text"] == cover_letter:
+        return
+    history.append({
+        "text": cover_letter,
+        "tone": tone,
+        "created_at": time.strftime("%Y-%m-%d %H:%M")
+    })
+
+def render_letter_history(page_size):
+    """
+    Show the session's generated letters with a bulk PDF export as one ZIP.
+    
+    Args:
+        page_size (str): Page size for the exported PDFs
+    """
+    history = list(st.session_state.letter_history)
+    if not history:
+        return
+    
+    with st.expander(f"🗂️ Letter history ({len(history)})"):
+        for index, entry in enumerate(reversed(history), start=1):
+            first_line = entry["text"].strip().split("\n", 1)[0][:80]
+            st.markdown(f"**{index}.** {entry['created_at']} · {entry['tone']} · {first_line}")
+        
+        # The ZIP is reused until the history or page size changes
+        export_key = (tuple(pdf_generator.cover_letter_hash(entry["text"]) for entry in history), page_size)
+        if st.button("📦 Export all as PDFs (ZIP)", use_container_width=True, help="Render every letter in the history to PDF in one ZIP file"):
+            with st.spinner("📦 Rendering PDFs..."):
+                try:
+                    buffer = BytesIO()
+                    pdf_generator.export_cover_letters_zip([entry["text"] for entry in history], buffer, page_size=page_size)
+                    st.session_state.history_zip = (export_key, buffer.getvalue())
+                except Exception as e:
+                    st.error(f"PDF export error: {str(e)}")
+        
+        if st.session_state.history_zip and st.session_state.history_zip[0] == export_key:
+            st.download_button(
+                label="⬇️ Download ZIP",
+                data=st.session_state.history_zip[1],
+                file_name="cover_letters.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
+def active_job_count():
+    """
+    Count the session's unfinished background jobs, letter variants included.
+    
+    Returns:
+        int: Jobs pending or running
+    """
+    session_jobs = list(st.session_state.jobs.values()) + st.session_state.variant_jobs
+    return sum(not job.finished for job in session_jobs)
+
+def start_background_job(kind, label, func, *args, meta=None, **kwargs):
+    """
+    Submit an AI task to the background executor and track it in the session.
+    
+    Args:
+        kind (str): "score" or "generate"
+        label (str): Description shown in the jobs panel
+        func (callable): Job function from the jobs module
+        *args: Positional arguments for func
+        meta (dict): Data used when the result is picked up
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        Job: The submitted job, or None if the session has too many jobs in flight
+    """
+    active = active_job_count()
+    if active >= MAX_JOBS_PER_SESSION:
+        st.warning(f"⚠️ {active} tasks are already running. Wait for one to finish or cancel it.")
+        return None
+    
+    # Record which inputs the job ran on; they may change before it finishes
+    meta = {"job_description": st.session_state.job_description, "cv_text": st.session_state.cv_text, **(meta or {})}
+    job = jobs.get_job_executor().submit(kind, label, func, *args, meta=meta, session=st.session_state.session_id, **kwargs)
+    st.session_state.jobs[job.id] = job
+    st.toast(f"🧵 {label} started in the background")
+    return job
+
+def collect_finished_jobs():
+    """Apply the results of finished background jobs to the session and drop them."""
+    for job_id, job in list(st.session_state.jobs.items()):
+        if not job.finished:
+            continue
+        
+        if job.status == jobs.DONE and job.kind == "score":
+            st.session_state.cv_score = job.result.to_dict()
+            index_analysis(job.meta["job_description"], job.meta["cv_text"], cv_score=st.session_state.cv_score)
+            st.toast(f"✅ Analysis complete! Score: {job.result.stars}")
+        elif job.status == jobs.DONE and job.kind == "generate" and job.result:
+            st.session_state.cover_letter = job.result
+            remember_letter(job.result, job.meta.get("tone", ""))
+            index_analysis(job.meta["job_description"], job.meta["cv_text"], cover_letter=job.result)
+            st.toast("🎉 Your cover letter is ready!")
+        elif job.status == jobs.DONE and job.kind == "score_and_generate" and job.result[1]:
+            scoring_result, cover_letter = job.result
+            st.session_state.cv_score = scoring_result
+            st.session_state.cover_letter = cover_letter
+            remember_letter(cover_letter, job.meta.get("tone", ""))
+            index_analysis(job.meta["job_description"], job.meta["cv_text"], cv_score=scoring_result, cover_letter=cover_letter)
+            st.toast(f"🎉 Analysis and cover letter are ready! Score: {scoring_result['stars']}")
+        elif job.status == jobs.DONE:
+            st.error(f"❌ {job.label} failed: the model returned an empty response. Please try again.")
+        elif job.status == jobs.FAILED:
+            st.error(f"❌ {job.label} failed: {job.error}")
+        elif job.status == jobs.CANCELLED:
+            st.toast(f"🛑 {job.label} cancelled")
+        
+        del st.session_state.jobs[job_id]
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_jobs_panel():
+    """Show the session's running background jobs, refreshed while any are in flight."""
+    session_jobs = list(st.session_state.jobs.values())
+    
+    # Rerun the whole app to pick up results once a job has finished
+    if any(job.finished for job in session_jobs):
+        st.rerun()
+    
+    for job in session_jobs:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            status = "⏳ Waiting" if job.status == jobs.PENDING else "⚙️ Running"
+            detail = f" · {len(job.progress.split())} words so far" if job.progress else ""
+            st.markdown(f"{status}: **{job.label}** ({job.elapsed:.0f}s{detail})")
+        with col2:
+            if st.button("🛑 Cancel", key=f"cancel_{job.id}", use_container_width=True):
+                job.cancel()
+        
+        # Letters are streamed into job.progress; show them as they are written
+        if job.kind == "generate" and job.progress:
+            with st.container(border=True):
+                st.write(job.progress)
+        elif job.kind == "generate" and job.status == jobs.RUNNING:
+            st.caption("⏳ Waiting for the first words...")
+
+def start_variants(tones, temperatures, tone_options, force_fresh):
+    """
+    Generate one cover letter per (tone, temperature) pair concurrently.
+    
+    Args:
+        tones (list): Tone names, keys of tone_options
+        temperatures (list): Creativity levels
+        tone_options (dict): Tone name -> tone instructions
+        force_fresh (bool): Bypass cached responses
+    """
+    pairs = [(tone, temperature) for tone in tones for temperature in temperatures]
+    if len(pairs) > MAX_VARIANTS:
+        st.warning(f"⚠️ Please choose at most {MAX_VARIANTS} combinations of tone and creativity level.")
+        return
+    
+    agent = cover_letter_agent.get_agent(temperature=temperatures[0])
+    is_valid, error_message = agent.validate_inputs(
+        st.session_state.cv_text,
+        st.session_state.job_description
+    )
+    if not is_valid:
+        st.error(f"❌ {error_message}")
+        return
+    
+    running_elsewhere = sum(not job.finished for job in st.session_state.jobs.values())
+    if running_elsewhere + len(pairs) > MAX_JOBS_PER_SESSION:
+        st.warning(
+            f"⚠️ {running_elsewhere} tasks are already running, so at most "
+            f"{max(MAX_JOBS_PER_SESSION - running_elsewhere, 0)} variants can start. "
+            "Wait for a task to finish or choose fewer combinations."
+        )
+        return
+    
+    inputs = background_inputs(agent)
+    
+    # A new comparison replaces the previous one
+    for job in st.session_state.variant_jobs:
+        job.cancel()
+    
+    executor = jobs.get_job_executor()
+    st.session_state.variant_jobs = [
+        executor.submit(
+            "variant",
+            f"{tone} · creativity {temperature:.1f}",
+            jobs.run_generation,
+            cover_letter_agent.get_agent(temperature=temperature),
+            tone=tone_options[tone],
+            use_cache=not force_fresh,
+            session=st.session_state.session_id,
+            meta={
+                "tone": tone,
+                "temperature": temperature,
+                "job_description": st.session_state.job_description,
+                "cv_text": st.session_state.cv_text
+            },
+            **inputs
+        )
+        for tone, temperature in pairs
+    ]
+
+def render_variant_cards():
+    """Show the letter variants side by side, with partial text while they stream."""
+    variants = st.session_state.variant_jobs
+    for row_start in range(0, len(variants), VARIANT_COLUMNS):
+        columns = st.columns(VARIANT_COLUMNS)
+        for column, job in zip(columns, variants[row_start:row_start + VARIANT_COLUMNS]):
+            with column:
+                st.markdown(f"**{job.label}**")
+                with st.container(border=True, height=400):
+                    if job.status == jobs.DONE:
+                        st.write(job.result)
+                    elif job.status == jobs.FAILED:
+                        st.error(f"❌ {job.error}")
+                    elif job.status == jobs.CANCELLED:
+                        st.caption("🛑 Cancelled")
+                    elif job.progress:
+                        st.write(job.progress)
+                    else:
+                        st.caption("⏳ Waiting for the first words...")
+                
+                if job.status == jobs.DONE and job.result:
+                    st.caption(f"{len(job.result.split())} words in {job.elapsed:.1f}s")
+                    if st.button("✅ Use this letter", key=f"use_variant_{job.id}", use_container_width=True):
+                        st.session_state.cover_letter = job.result
+                        remember_letter(job.result, job.meta["tone"])
+                        index_analysis(job.meta["job_description"], job.meta["cv_text"], cover_letter=job.result)
+                        st.rerun()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_variants_live():
+    """Refresh the variant cards while any variant is still being written."""
+    render_variant_cards()
+    if all(job.finished for job in st.session_state.variant_jobs):
+        st.rerun()
+
+def render_variants_section(tone_options, selected_tone, temperature, force_fresh, requirements_met):
+    """
+    Compare cover letters in several tones and creativity levels side by side.
+    
+    Args:
+        tone_options (dict): Tone name -> tone instructions
+        selected_tone (str): Tone chosen in the sidebar
+        temperature (float): Creativity level chosen in the sidebar
+        force_fresh (bool): Bypass cached responses
+        requirements_met (bool): Whether CV, job description and API key are available
+    """
+    with st.expander("🎭 Compare tones side by side", expanded=bool(st.session_state.variant_jobs)):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            tones = st.multiselect("Tones", options=list(tone_options.keys()), default=[selected_tone])
+        with col2:
+            temperature_options = sorted({0.3, 0.7, 1.0, round(temperature, 1)})
+            temperatures = st.multiselect("Creativity levels", options=temperature_options, default=[round(temperature, 1)])
+        
+        if st.button(
+            "🎭 Generate Variants",
+            disabled=not (requirements_met and tones and temperatures),
+            use_container_width=True,
+            help="Write a letter for every selected tone and creativity level at the same time"
+        ):
+            start_variants(tones, temperatures, tone_options, force_fresh)
+        
+        if not st.session_state.variant_jobs:
+            return
+        if all(job.finished for job in st.session_state.variant_jobs):
+            render_variant_cards()
+        else:
+            render_variants_live()
+
+def render_diagnostics_panel():
+    """Show recent stage timings, token usage and metric exports in the sidebar."""
+    if not st.session_state.get("show_diagnostics"):
+        return
+    
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🩺 Diagnostics")
+        
+        spans = list(st.session_state.diagnostics_spans)
+        if spans:
+            st.dataframe(
+                [
+                    {
+                        "stage": record["stage"],
+                        "task": record.get("task", ""),
+                        "ms": record["duration_ms"],
+                        "tokens in": record.get("input_tokens"),
+                        "tokens out": record.get("output_tokens"),
+                        "model": record.get("model", ""),
+                        "attempts": record.get("attempts"),
+                        "error": record["error"] or ""
+                    }
+                    for record in reversed(spans)
+                ],
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No stages recorded in this session yet.")
+        
+        with st.expander("Process totals"):
+            st.json(registry.snapshot())
+        
+        with st.expander("Model routes"):
+            routes = registry.route_snapshot()
+            if routes:
+                st.dataframe(routes, hide_index=True, use_container_width=True)
+            else:
+                st.caption("No AI calls made in this process yet.")
+        
+        with st.expander("Rate limits"):
+            st.json(rate_limiter.limiter_stats())
+        
+        st.download_button(
+            label="📈 Metrics (Prometheus text)",
+            data=registry.prometheus_text(),
+            file_name="covercraft_metrics.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+        st.download_button(
+            label="🧾 Session stages (JSON)",
+            data=json.dumps(spans, indent=2),
+            file_name="covercraft_stages.json",
+            mime="application/json",
+            use_container_width=True
+        )
+
 def main():
     """Main application function."""
     
     # Initialize session state
     initialize_session_state()
     
+    # Record stage timings of this run for the diagnostics panel
+    bind_trace(st.session_state.diagnostics_spans)
+    
+    # Pick up the results of background tasks that finished since the last run
+    collect_finished_jobs()
+    
     # App header
     st.markdown('<h1 class="main-header">✨ CoverCraft AI ✨🚀</h1>', unsafe_allow_html=True)
     st.markdown('<p style="text-align: center; font-size: 1.3em; background: linear-gradient(45deg, #FF6B6B, #4ECDC4, #45B7D1); -webkit-background-clip: text; -webkit-text-fill-color: transparent; background-clip: text; font-weight: bold; margin-bottom: 2rem;">🎯 Transform your job search with AI-powered cover letters! 🎯</p>', unsafe_allow_html=True)
@@ -292,6 +833,44 @@ def main():
         with st.expander("ℹ️ About this tone"):
             st.write(tone_options[selected_tone])
         
+        # PDF page size
+        page_size = st.selectbox(
+            "📄 PDF Page Size",
+            options=PAGE_SIZE_OPTIONS,
+            index=0,
+            help="Paper size used when preparing the PDF download."
+        )
+        
+        # Response cache bypass
+        force_fresh = st.checkbox(
+            "♻️ Force fresh results",
+            value=False,
+            help="Skip previously cached AI responses for identical inputs and ask the model again."
+        )
+        
+        # Send the cached CV digest instead of the full CV text
+        st.checkbox(
+            "🗜️ Use compact CV profile",
+            value=True,
+            key="use_cv_digest",
+            help="Summarize your CV once into a compact profile and send that with every request instead of the full text. Fewer tokens, faster answers."
+        )
+        
+        # Background execution of AI tasks
+        run_in_background = st.checkbox(
+            "🧵 Run AI tasks in the background",
+            value=True,
+            help="Keep using the page while the match analysis or cover letter is prepared. Several tasks can run at once."
+        )
+        
+        # Stage timing and token usage panel
+        st.checkbox(
+            "🩺 Show diagnostics",
+            value=False,
+            key="show_diagnostics",
+            help="Show how long PDF parsing, prompt rendering, AI calls and PDF rendering took, and the tokens used."
+        )
+        
         st.markdown("---")
         st.markdown("### 📋🌟 How to Get Started 🌟📋")
         st.markdown("""
@@ -306,16 +885,26 @@ def main():
         
         # Quick scoring button
         if st.button("🎯 Analyze CV Match", help="Get a quick match score without generating a cover letter", use_container_width=True):
-            if st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description:
+            if st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description and run_in_background:
+                try:
+                    agent = cover_letter_agent.get_agent(temperature=temperature)
+                    start_background_job("score", "CV match analysis", jobs.run_scoring, agent, use_cache=not force_fresh, **background_inputs(agent))
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+            elif st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description:
                 with st.spinner("📊 Analyzing match... "):
                     try:
-                        agent = CoverLetterAgent(temperature=temperature)
-                        scoring_result = agent.score_cv_match(
-                            st.session_state.cv_text,
-                            st.session_state.job_description
+                        agent = cover_letter_agent.get_agent(temperature=temperature)
+                        cv_text, job_description = budgeted_inputs(agent)
+                        scoring_result = agent.score_cv_match_structured(
+                            cv_text,
+                            job_description,
+                            use_cache=not force_fresh
                         )
-                        st.session_state.cv_score = scoring_result
-                        st.success(f"✅ Analysis complete! Score: {scoring_result['stars']}")
+                        if scoring_result:
+                            st.session_state.cv_score = scoring_result.to_dict()
+                            index_analysis(cv_score=st.session_state.cv_score)
+                            st.success(f"✅ Analysis complete! Score: {scoring_result.stars}")
                     except Exception as e:
                         st.error(f"❌ Error: {str(e)}")
             else:
@@ -346,12 +935,20 @@ def main():
             help="Upload your CV in PDF format"
         )
         
-        if uploaded_file is not None:
+        if uploaded_file is not None and uploaded_file.size > pdf_utils.MAX_UPLOAD_BYTES:
+            st.error(f"❌ The file is too large. Please upload a PDF smaller than {pdf_utils.MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+            st.session_state.cv_text = ""
+        elif uploaded_file is not None:
             with st.spinner("Extracting text from PDF..."):
-                cv_text = extract_text_from_pdf(uploaded_file)
+                # Hash a zero-copy view of the upload rather than a copy of its bytes
+                try:
+                    cv_text, is_valid_cv = pdf_utils.extract_cv_cached(pdf_utils.pdf_digest(uploaded_file.getbuffer()), uploaded_file)
+                except Exception as e:
+                    st.error(f"Error reading PDF file: {str(e)}")
+                    cv_text, is_valid_cv = None, False
                 
                 if cv_text:
-                    if validate_pdf_content(cv_text):
+                    if is_valid_cv:
                         st.session_state.cv_text = cv_text
                         st.markdown('<div class="success-box">✅ CV uploaded and processed successfully!</div>', unsafe_allow_html=True)
                         
@@ -373,8 +970,11 @@ def main():
     with col2:
         st.markdown('<h2 class="section-header">✨ Dream Job Description ✨💼</h2>', unsafe_allow_html=True)
         
+        render_imported_postings()
+        
         job_description = st.text_area(
             "Paste the job description here",
+            key="job_description_input",
             height=350,
             placeholder="Copy and paste the complete job description, including requirements, responsibilities, and company information...",
             help="Include as much detail as possible for better cover letter generation"
@@ -387,6 +987,14 @@ def main():
             # Show word count
             word_count = len(job_description.split())
             st.info(f"📊 Word count: {word_count}")
+            
+            # Instant local keyword match, no AI call needed
+            if st.session_state.cv_text:
+                estimate = relevance.preliminary_score(st.session_state.cv_text, job_description)
+                st.info(f"⚡ Instant keyword match: {estimate['stars']} ({estimate['coverage']:.0%} of key terms found in your CV)")
+                
+                # Earlier results for a reposted or lightly edited copy of this posting
+                render_near_duplicate(job_description)
     
     # Display CV Match Score (if available)
     if st.session_state.cv_score:
@@ -432,16 +1040,28 @@ def main():
         col1, col2, col3 = st.columns([2, 1, 2])
         with col2:
             if st.button("🔄 Re-analyze Match", help="Generate a new CV match analysis"):
-                if st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description:
+                if st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description and run_in_background:
+                    try:
+                        agent = cover_letter_agent.get_agent(temperature=temperature)
+                        # Re-analysis always asks the model for a new assessment
+                        start_background_job("score", "CV match re-analysis", jobs.run_scoring, agent, use_cache=False, **background_inputs(agent))
+                    except Exception as e:
+                        st.error(f"❌ Error re-analyzing: {str(e)}")
+                elif st.session_state.api_key_set and st.session_state.cv_text and st.session_state.job_description:
                     with st.spinner("📊 Re-analyzing CV-Job match... "):
                         try:
-                            agent = CoverLetterAgent(temperature=temperature)
-                            scoring_result = agent.score_cv_match(
-                                st.session_state.cv_text,
-                                st.session_state.job_description
+                            agent = cover_letter_agent.get_agent(temperature=temperature)
+                            cv_text, job_description = budgeted_inputs(agent)
+                            # Re-analysis always asks the model for a new assessment
+                            scoring_result = agent.score_cv_match_structured(
+                                cv_text,
+                                job_description,
+                                use_cache=False
                             )
-                            st.session_state.cv_score = scoring_result
-                            st.rerun()
+                            if scoring_result:
+                                st.session_state.cv_score = scoring_result.to_dict()
+                                index_analysis(cv_score=st.session_state.cv_score)
+                                st.rerun()
                         except Exception as e:
                             st.error(f"❌ Error re-analyzing: {str(e)}")
     
@@ -475,39 +1095,126 @@ def main():
             use_container_width=True,
             type="primary"
         )
+        combined_button = st.button(
+            "⚡ Analyze Match + Write Letter in One Go",
+            disabled=not requirements_met,
+            use_container_width=True,
+            help="Get the match analysis and the cover letter from a single AI request"
+        )
     
     # Generate cover letter
     if generate_button and requirements_met:
-        with st.spinner("🎨✨ AI is crafting your amazing cover letter... Magic in progress! ✨🎨"):
-            try:
-                # Initialize the agent with custom temperature
-                agent = CoverLetterAgent(temperature=temperature)
-                
-                # Validate inputs
-                is_valid, error_message = agent.validate_inputs(
-                    st.session_state.cv_text, 
-                    st.session_state.job_description
+        try:
+            # Get the shared agent for the selected temperature
+            agent = cover_letter_agent.get_agent(temperature=temperature)
+            
+            # Validate inputs
+            is_valid, error_message = agent.validate_inputs(
+                st.session_state.cv_text, 
+                st.session_state.job_description
+            )
+            
+            if not is_valid:
+                st.error(f"❌ {error_message}")
+                return
+            
+            if run_in_background:
+                start_background_job(
+                    "generate",
+                    f"{selected_tone} cover letter",
+                    jobs.run_generation,
+                    agent,
+                    tone=tone_options[selected_tone],
+                    use_cache=not force_fresh,
+                    meta={"tone": selected_tone},
+                    **background_inputs(agent)
                 )
+            else:
+                cv_text, job_description = budgeted_inputs(agent)
                 
-                if not is_valid:
-                    st.error(f"❌ {error_message}")
-                    return
-                
-                # Generate cover letter with selected tone
-                cover_letter = agent.generate_cover_letter(
-                    st.session_state.cv_text,
-                    st.session_state.job_description,
-                    tone=tone_options[selected_tone]
-                )
+                # Stream the cover letter into the page as tokens arrive; errors are
+                # raised so a letter cut off mid-stream is never saved
+                st.caption("🎨✨ AI is crafting your amazing cover letter... Magic in progress! ✨🎨")
+                with st.container(border=True):
+                    try:
+                        cover_letter = st.write_stream(
+                            agent.stream_cover_letter(
+                                cv_text,
+                                job_description,
+                                tone=tone_options[selected_tone],
+                                use_cache=not force_fresh,
+                                raise_errors=True
+                            )
+                        )
+                    except Exception as e:
+                        st.error(f"❌ The cover letter was interrupted: {str(e)}. Please try again.")
+                        return
                 
                 if cover_letter:
                     st.session_state.cover_letter = cover_letter
+                    remember_letter(cover_letter, selected_tone)
+                    index_analysis(cover_letter=cover_letter)
                     st.success("🎉🌟 Amazing! Your cover letter has been crafted to perfection! 🌟🎉")
                 else:
                     st.error("❌ Failed to generate cover letter. Please try again.")
-                    
-            except Exception as e:
-                st.error(f"❌ An error occurred: {str(e)}")
+                
+        except Exception as e:
+            st.error(f"❌ An error occurred: {str(e)}")
+    
+    # Score and generate in a single request
+    if combined_button and requirements_met:
+        try:
+            agent = cover_letter_agent.get_agent(temperature=temperature)
+            
+            is_valid, error_message = agent.validate_inputs(
+                st.session_state.cv_text, 
+                st.session_state.job_description
+            )
+            
+            if not is_valid:
+                st.error(f"❌ {error_message}")
+                return
+            
+            if run_in_background:
+                start_background_job(
+                    "score_and_generate",
+                    f"Match analysis + {selected_tone} cover letter",
+                    jobs.run_score_and_generate,
+                    agent,
+                    tone=tone_options[selected_tone],
+                    use_cache=not force_fresh,
+                    meta={"tone": selected_tone},
+                    **background_inputs(agent)
+                )
+            else:
+                cv_text, job_description = budgeted_inputs(agent)
+                
+                with st.spinner("⚡✨ Analyzing your match and crafting your cover letter in one go... ✨⚡"):
+                    scoring_result, cover_letter = agent.score_and_generate(
+                        cv_text,
+                        job_description,
+                        tone=tone_options[selected_tone],
+                        use_cache=not force_fresh
+                    )
+                
+                if cover_letter:
+                    st.session_state.cv_score = scoring_result
+                    st.session_state.cover_letter = cover_letter
+                    remember_letter(cover_letter, selected_tone)
+                    index_analysis(cv_score=scoring_result, cover_letter=cover_letter)
+                    st.rerun()
+                else:
+                    st.error("❌ Failed to generate analysis and cover letter. Please try again.")
+                
+        except Exception as e:
+            st.error(f"❌ An error occurred: {str(e)}")
+    
+    # Letters in several tones, written concurrently
+    render_variants_section(tone_options, selected_tone, temperature, force_fresh, requirements_met)
+    
+    # Background tasks of this session, refreshed until they finish
+    if st.session_state.jobs:
+        render_jobs_panel()
     
     # Display generated cover letter
     if st.session_state.cover_letter:
@@ -539,45 +1246,76 @@ def main():
             )
         
         with col3:
-            try:
-                # Extract applicant name for PDF filename
-                lines = cover_letter_edited.split('\n')[:3]
-                applicant_name = "[Your Name]"
-                for line in lines:
-                    if line.strip() and not line.strip().lower().startswith(('dear', 'to whom', 'hiring')):
-                        # Try to find a name-like line
-                        words = line.strip().split()
-                        if 2 <= len(words) <= 4 and not any(word.lower() in ['sincerely', 'regards', 'yours'] for word in words):
-                            applicant_name = line.strip()
-                            break
-                
-                # Generate PDF
-                pdf_data = create_cover_letter_pdf(cover_letter_edited, applicant_name)
-                pdf_filename = format_filename(applicant_name)
-                
-                st.download_button(
-                    label="📋 Download as PDF",
-                    data=pdf_data,
-                    file_name=pdf_filename,
-                    mime="application/pdf",
-                    use_container_width=True,
-                    help="Download as a formatted PDF document"
-                )
-            except Exception as e:
-                st.error(f"PDF generation error: {str(e)}")
-                st.download_button(
-                    label="📋 PDF (Install reportlab)",
-                    data="",
-                    file_name="error.txt",
-                    disabled=True,
-                    use_container_width=True,
-                    help="Install reportlab package for PDF generation"
-                )
+            letter_hash = pdf_generator.cover_letter_hash(cover_letter_edited)
+            
+            # Render the PDF only on request; the result is memoized per letter
+            if st.session_state.pdf_ready_hash != letter_hash:
+                if st.button("📋 Prepare PDF", use_container_width=True, help="Render a formatted PDF document for download"):
+                    st.session_state.pdf_ready_hash = letter_hash
+            
+            if st.session_state.pdf_ready_hash == letter_hash:
+                try:
+                    # Extract applicant name for PDF filename
+                    applicant_name = pdf_generator.applicant_name_from_letter(cover_letter_edited)
+                    
+                    # Generate PDF (cached by letter hash and page size)
+                    pdf_data = pdf_generator.create_cover_letter_pdf_cached(letter_hash, page_size, cover_letter_edited)
+                    pdf_filename = pdf_generator.format_filename(applicant_name)
+                    
+                    st.download_button(
+                        label="📋 Download as PDF",
+                        data=pdf_data,
+                        file_name=pdf_filename,
+                        mime="application/pdf",
+                        use_container_width=True,
+                        help="Download as a formatted PDF document"
+                    )
+                except Exception as e:
+                    st.error(f"PDF generation error: {str(e)}")
+                    st.download_button(
+                        label="📋 PDF (Install reportlab)",
+                        data="",
+                        file_name="error.txt",
+                        disabled=True,
+                        use_container_width=True,
+                        help="Install reportlab package for PDF generation"
+                    )
         
         # Word count for cover letter
         word_count = len(cover_letter_edited.split())
         st.info(f"📊 Cover letter word count: {word_count}")
         
+        # Rewrite a single paragraph instead of the whole letter
+        with st.expander("✏️ Rewrite One Paragraph"):
+            paragraphs = cover_letter_agent.split_paragraphs(cover_letter_edited)
+            paragraph_index = st.selectbox(
+                "Paragraph to rewrite",
+                options=range(len(paragraphs)),
+                format_func=lambda index: f"{index + 1}. {paragraphs[index][:80]}{'…' if len(paragraphs[index]) > 80 else ''}"
+            )
+            instructions = st.text_input(
+                "What should change? (optional)",
+                placeholder="e.g. more concrete, mention my team leadership"
+            )
+            
+            if st.button("✏️ Rewrite Paragraph", disabled=not (paragraphs and st.session_state.api_key_set and st.session_state.cv_text)):
+                with st.spinner("✏️ Rewriting paragraph..."):
+                    agent = cover_letter_agent.get_agent(temperature=temperature)
+                    new_paragraph = agent.regenerate_paragraph(
+                        cover_letter_edited,
+                        paragraph_index,
+                        st.session_state.cv_text,
+                        tone=tone_options[selected_tone],
+                        instructions=instructions,
+                        # Asking again should give a different rewrite
+                        use_cache=False
+                    )
+                if new_paragraph:
+                    st.session_state.cover_letter = cover_letter_agent.replace_paragraph(cover_letter_edited, paragraph_index, new_paragraph)
+                    st.rerun()
+        
+        render_letter_history(page_size)
+        
         # Tips section
         with st.expander("💡 Tips for Using Your Cover Letter"):
             st.markdown("""
@@ -593,3 +1331,7 @@ def main():
 
 if __name__ == "__main__":
     main()
+    # Rendered after main() so it includes the stages of this run
+    render_diagnostics_panel()
+    # The page has been sent; load the remaining subsystems before they are needed
+    prewarm(PREWARM_MODULES)
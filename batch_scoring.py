@@ -0,0 +1,332 @@
+"""
+Batch scoring of one CV against many job descriptions.
+
+Usage:
+    python batch_scoring.py CV.pdf JOBS -o results.csv [--concurrency 8]
+
+JOBS is a directory of .txt/.md job descriptions, a JSONL file with one job
+per line, or a job store database filled by job_store.py. Results are written
+as each job finishes, then the output file is rewritten in ranked order once
+the run completes.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+from cover_letter_agent import get_agent
+from job_store import JobStore
+from pdf_utils import extract_text_from_pdf
+from relevance import RelevanceIndex
+from token_budget import count_tokens
+
+
+# File extensions of job store databases (see job_store.py)
+JOB_STORE_EXTENSIONS = (".sqlite3", ".sqlite", ".db")
+
+# Keys checked, in order, for the job description text in JSONL records
+JSONL_TEXT_FIELDS = ("job_description", "description", "text", "content")
+
+RESULT_FIELDS = ["rank", "job_id", "title", "score", "stars", "lexical_score", "analysis", "strengths", "gaps", "recommendations", "error"]
+
+
+def load_job_descriptions(source):
+    """
+    Lazily read job descriptions from a directory, a JSONL file or a job store.
+    
+    Args:
+        source (str): Directory of .txt/.md files, or path to a JSONL file or job store database
+    
+    Yields:
+        dict: Job with "job_id", "title" and "job_description" keys
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.lower().endswith((".txt", ".md")):
+                continue
+            with open(os.path.join(source, name), encoding="utf-8") as f:
+                yield {
+                    "job_id": name,
+                    "title": os.path.splitext(name)[0],
+                    "job_description": f.read()
+                }
+        return
+    
+    if source.lower().endswith(JOB_STORE_EXTENSIONS):
+        if not os.path.isfile(source):
+            raise FileNotFoundError(f"Job store not found: {source}")
+        for posting in JobStore(source).iter_postings():
+            yield {
+                "job_id": posting["job_id"],
+                "title": posting["title"],
+                "job_description": posting["description"]
+            }
+        return
+    
+    with open(source, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = next((record[field] for field in JSONL_TEXT_FIELDS if record.get(field)), "")
+            yield {
+                "job_id": str(record.get("id", line_number)),
+                "title": record.get("title", ""),
+                "job_description": text
+            }
+
+
+def prerank_jobs(cv_text, source, top_k):
+    """
+    Keep only the top_k jobs by local BM25 relevance to the CV.
+    
+    The source is read twice: once to index every description by its
+    position, and once to pick out the top_k jobs, so only the index and
+    the selected jobs are held in memory.
+    
+    Args:
+        cv_text (str): Extracted CV text
+        source (str): Job source accepted by load_job_descriptions()
+        top_k (int): Number of jobs to keep
+    
+    Returns:
+        list: The top_k job dicts, best first, each with a "lexical_score"
+    """
+    index = RelevanceIndex()
+    for position, job in enumerate(load_job_descriptions(source)):
+        index.add(position, job["job_description"])
+    
+    lexical_scores = dict(index.rank(cv_text, top_k=top_k))
+    selected = {}
+    for position, job in enumerate(load_job_descriptions(source)):
+        if position in lexical_scores:
+            job["lexical_score"] = round(lexical_scores[position], 4)
+            selected[position] = job
+            if len(selected) == len(lexical_scores):
+                break
+    
+    return [selected[position] for position in lexical_scores if position in selected]
+
+
+async def score_jobs(cv_text, jobs, agent, concurrency=8, use_cache=True):
+    """
+    Score a CV against many job descriptions with bounded concurrency.
+    
+    Jobs are pulled from the iterable only as workers become free, so large
+    sources are never fully loaded into memory.
+    
+    Args:
+        cv_text (str): Extracted CV text
+        jobs (iterable): Job dicts as produced by load_job_descriptions()
+        agent (CoverLetterAgent): Agent used for scoring
+        concurrency (int): Maximum number of scoring calls in flight
+        use_cache (bool): Whether cached responses may be returned
+    
+    Yields:
+        dict: Result row (see RESULT_FIELDS) as soon as each job finishes
+    """
+    job_queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+    done = object()
+    
+    async def produce():
+        for job in jobs:
+            await job_queue.put(job)
+        for _ in range(concurrency):
+            await job_queue.put(done)
+    
+    async def work():
+        while True:
+            job = await job_queue.get()
+            if job is done:
+                await results.put(done)
+                return
+            await results.put(await _score_one(cv_text, job, agent, use_cache))
+    
+    tasks = [asyncio.create_task(produce())]
+    tasks.extend(asyncio.create_task(work()) for _ in range(concurrency))
+    
+    try:
+        finished_workers = 0
+        while finished_workers < concurrency:
+            row = await results.get()
+            if row is done:
+                finished_workers += 1
+            else:
+                yield row
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _score_one(cv_text, job, agent, use_cache):
+    """
+    Score a single job, recording failures in the result row instead of raising.
+    
+    Args:
+        cv_text (str): Extracted CV text
+        job (dict): Job dict
+        agent (CoverLetterAgent): Agent used for scoring
+        use_cache (bool): Whether cached responses may be returned
+    
+    Returns:
+        dict: Result row
+    """
+    row = {field: "" for field in RESULT_FIELDS}
+    row.update(job_id=job["job_id"], title=job["title"], score=0, lexical_score=job.get("lexical_score", ""))
+    
+    is_valid, error_message = agent.validate_inputs(cv_text, job["job_description"])
+    if not is_valid:
+        row["error"] = error_message
+        return row
+    
+    try:
+        cv_content, job_description, _ = agent.fit_inputs(cv_text, job["job_description"])
+        row.update(await agent.ascore_cv_match(cv_content, job_description, use_cache=use_cache))
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def rank_results(rows):
+    """
+    Sort result rows best first and assign ranks; failed jobs go last.
+    
+    Args:
+        rows (list): Result rows
+    
+    Returns:
+        list: Ranked result rows
+    """
+    ranked = sorted(rows, key=lambda row: (bool(row["error"]), -row["score"]))
+    for rank, row in enumerate(ranked, start=1):
+        row["rank"] = rank
+    return ranked
+
+
+class ResultWriter:
+    """Appends result rows to a CSV or JSONL file, flushing after each row."""
+    
+    def __init__(self, path):
+        """
+        Open the output file; the format is chosen by extension (.jsonl or .csv).
+        
+        Args:
+            path (str): Output file path
+        """
+        self.path = path
+        self.is_jsonl = path.lower().endswith((".jsonl", ".json"))
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        if not self.is_jsonl:
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.csv_writer.writeheader()
+    
+    def write(self, row):
+        """Write one result row."""
+        if self.is_jsonl:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            self.csv_writer.writerow(row)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+
+async def run_batch(cv_path, jobs_source, output_path, concurrency=8, temperature=0.3, use_cache=True, top_k=None, use_digest=True):
+    """
+    Score a CV PDF against every job in a source and write ranked results.
+    
+    Args:
+        cv_path (str): Path to the CV PDF
+        jobs_source (str): Directory or JSONL file of job descriptions
+        output_path (str): CSV or JSONL output path
+        concurrency (int): Maximum number of scoring calls in flight
+        temperature (float): Temperature for the scoring model
+        use_cache (bool): Whether cached responses may be returned
+        top_k (int): If set, only the top_k jobs by local BM25 relevance are sent to the LLM
+        use_digest (bool): Send the compact CV digest instead of the raw CV text
+    
+    Returns:
+        list: Ranked result rows
+    """
+    with open(cv_path, "rb") as f:
+        cv_text = extract_text_from_pdf(f)
+    if not cv_text:
+        raise ValueError(f"Could not extract text from {cv_path}")
+    
+    agent = get_agent(temperature=temperature)
+    rows = []
+    
+    if top_k:
+        jobs = prerank_jobs(cv_text, jobs_source, top_k)
+    else:
+        jobs = load_job_descriptions(jobs_source)
+    
+    # Summarize the CV once; every scoring call then sends the profile if it is shorter
+    if use_digest:
+        profile = await asyncio.to_thread(agent.cv_digest, cv_text, use_cache, True)
+        if count_tokens(profile, agent.model) < count_tokens(cv_text, agent.model):
+            cv_text = profile
+    
+    # Stream rows to disk as they finish so partial runs are never lost
+    writer = ResultWriter(output_path)
+    try:
+        async for row in score_jobs(cv_text, jobs, agent, concurrency, use_cache):
+            writer.write(row)
+            rows.append(row)
+            print(f"[{len(rows)}] {row['job_id']}: {row['error'] or row['stars']}", file=sys.stderr)
+    finally:
+        writer.close()
+    
+    # Rewrite the output in ranked order
+    ranked = rank_results(rows)
+    writer = ResultWriter(output_path)
+    try:
+        for row in ranked:
+            writer.write(row)
+    finally:
+        writer.close()
+    
+    return ranked
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Score one CV against many job descriptions.")
+    parser.add_argument("cv", help="Path to the CV PDF")
+    parser.add_argument("jobs", help="Directory of .txt/.md job descriptions, a JSONL file or a job store database")
+    parser.add_argument("-o", "--output", default="batch_results.csv", help="Output file (.csv or .jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum concurrent scoring calls")
+    parser.add_argument("-t", "--temperature", type=float, default=0.3, help="Scoring model temperature")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses")
+    parser.add_argument("-k", "--top-k", type=int, default=None, help="Only send the top K jobs by local keyword relevance to the LLM")
+    parser.add_argument("--raw-cv", action="store_true", help="Send the full CV text instead of the compact CV digest")
+    args = parser.parse_args(argv)
+    
+    load_dotenv()
+    
+    ranked = asyncio.run(run_batch(
+        args.cv,
+        args.jobs,
+        args.output,
+        concurrency=args.concurrency,
+        temperature=args.temperature,
+        use_cache=not args.no_cache,
+        top_k=args.top_k,
+        use_digest=not args.raw_cv
+    ))
+    
+    for row in ranked[:10]:
+        print(f"{row['rank']:>3}. {row['stars'] or '-':<5} {row['title'] or row['job_id']}")
+    print(f"Wrote {len(ranked)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the local (non-LLM) hot paths.
+
+Run from the project root with ``python -m benchmarks.run``.
+"""
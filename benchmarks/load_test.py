@@ -0,0 +1,187 @@
+"""
+End-to-end load test of the extract -> score -> generate -> PDF pipeline.
+
+Usage (from the project root):
+    python -m benchmarks.load_test --sessions 20 --iterations 3 --start-stub --latency 0.5
+    python -m benchmarks.load_test --sessions 20 --base-url http://127.0.0.1:8765/v1
+
+Each simulated session runs the full pipeline the app runs for one user.
+The report shows overall throughput plus p50/p95/p99 latency and error
+counts per stage. With --start-stub an in-process stub server (see
+benchmarks.stub_openai) stands in for OpenAI, so no API key or network is
+needed.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks.stub_openai import add_stub_arguments, settings_from_args, start_stub_server
+from benchmarks.synthetic import synthetic_cv_pdf
+
+
+STAGES = ["extract", "score", "generate", "pdf"]
+
+JOB_DESCRIPTION = (
+    "We are hiring a senior data engineer to design and operate our analytics platform. "
+    "Responsibilities include building Python and SQL pipelines on AWS, orchestrating workloads with Airflow, "
+    "mentoring the team and working with stakeholders to reduce latency and cost. "
+    "Requirements: 5+ years of experience, a degree in computer science or related field, Docker and Kubernetes."
+)
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    
+    Args:
+        samples (list): Measurements
+        fraction (float): Percentile as a fraction (0.95 for p95)
+    
+    Returns:
+        float: Percentile value, or 0.0 for no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StageRecorder:
+    """Thread-safe collection of per-stage latencies and errors."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+    
+    def record(self, stage, seconds, ok):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+            if not ok:
+                self.errors[stage] += 1
+
+
+def run_session(session_id, iterations, pdf_bytes, recorder):
+    """
+    Run the pipeline repeatedly as one simulated user.
+    
+    Args:
+        session_id (int): Session number (varies the temperature so sessions use different agents)
+        iterations (int): Number of pipeline runs
+        pdf_bytes (bytes): CV PDF to upload
+        recorder (StageRecorder): Where to record measurements
+    """
+    from cover_letter_agent import get_agent
+    from pdf_generator import create_cover_letter_pdf
+    from pdf_utils import extract_text_from_pdf
+    
+    agent = get_agent(temperature=0.5 + (session_id % 3) / 10)
+    
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cv_text = extract_text_from_pdf(BytesIO(pdf_bytes))
+        recorder.record("extract", time.perf_counter() - start, bool(cv_text))
+        if not cv_text:
+            continue
+        
+        # The response cache is bypassed so every request reaches the server
+        start = time.perf_counter()
+        score = agent.score_cv_match_structured(cv_text, JOB_DESCRIPTION, use_cache=False)
+        recorder.record("score", time.perf_counter() - start, score is not None)
+        
+        start = time.perf_counter()
+        letter = agent.generate_cover_letter(cv_text, JOB_DESCRIPTION, use_cache=False)
+        recorder.record("generate", time.perf_counter() - start, bool(letter))
+        if not letter:
+            continue
+        
+        start = time.perf_counter()
+        pdf_data = create_cover_letter_pdf(letter)
+        recorder.record("pdf", time.perf_counter() - start, bool(pdf_data))
+
+
+def run_load_test(sessions, iterations, pages=2):
+    """
+    Drive concurrent simulated sessions and summarize the measurements.
+    
+    Args:
+        sessions (int): Number of concurrent sessions
+        iterations (int): Pipeline runs per session
+        pages (int): Pages in the synthetic CV
+    
+    Returns:
+        dict: Report with throughput and per-stage latency percentiles in milliseconds
+    """
+    pdf_bytes = synthetic_cv_pdf(pages=pages)
+    recorder = StageRecorder()
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [executor.submit(run_session, session_id, iterations, pdf_bytes, recorder) for session_id in range(sessions)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    
+    completed = len(recorder.latencies["pdf"]) - recorder.errors["pdf"]
+    report = {
+        "sessions": sessions,
+        "iterations": iterations,
+        "elapsed_s": round(elapsed, 3),
+        "pipelines_completed": completed,
+        "throughput_per_s": round(completed / elapsed, 3) if elapsed else 0.0,
+        "stages": {}
+    }
+    for stage in STAGES:
+        samples = [seconds * 1000 for seconds in recorder.latencies[stage]]
+        report["stages"][stage] = {
+            "count": len(samples),
+            "errors": recorder.errors[stage],
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+            "p99_ms": round(percentile(samples, 0.99), 2)
+        }
+    return report
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Load test the CV pipeline against a real or stub OpenAI endpoint.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="Pipeline runs per session")
+    parser.add_argument("--pages", type=int, default=2, help="Pages in the synthetic CV")
+    parser.add_argument("--base-url", help="OpenAI-compatible base URL (e.g. a running stub)")
+    parser.add_argument("--start-stub", action="store_true", help="Start an in-process stub server")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    if args.start_stub:
+        _, args.base_url = start_stub_server(settings_from_args(args))
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+    
+    report = run_load_test(args.sessions, args.iterations, args.pages)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    
+    print(f"{report['pipelines_completed']} pipelines in {report['elapsed_s']} s "
+          f"({report['throughput_per_s']} per second, {args.sessions} sessions)")
+    print(f"{'stage':<10}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<10}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
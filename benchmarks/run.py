@@ -0,0 +1,247 @@
+"""
+Benchmark runner for the local hot paths.
+
+Usage (from the project root):
+    python -m benchmarks.run                    # run and compare against the baseline
+    python -m benchmarks.run --update-baseline  # run and store the results as the new baseline
+    python -m benchmarks.run --only pdf         # run benchmarks whose name contains "pdf"
+    python -m benchmarks.run --only import      # cold-start import times only
+
+Results are written as JSON. A benchmark whose median time exceeds the
+baseline by more than the threshold is reported as a regression and the
+process exits with status 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+from benchmarks.synthetic import synthetic_cover_letter, synthetic_cv_pdf, synthetic_scoring_output
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results", "latest.json")
+
+# Relative slowdown of the median tolerated before a benchmark counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Child process that reports how long importing one module takes in a fresh interpreter
+IMPORT_TIMER = (
+    "import sys, time; start = time.perf_counter(); __import__(sys.argv[1]); "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def measure(func, min_runs=5, min_seconds=0.5, max_runs=1000):
+    """
+    Time repeated calls of a zero-argument function.
+    
+    Args:
+        func (callable): Function to time
+        min_runs (int): Minimum number of timed calls
+        min_seconds (float): Keep running until at least this much time has been spent
+        max_runs (int): Upper bound on timed calls
+    
+    Returns:
+        dict: "median_ms", "min_ms", "max_ms" and "runs"
+    """
+    # Warm-up call so one-off imports and caches don't skew the first sample
+    func()
+    
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_seconds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "runs": len(samples)
+    }
+
+
+def measure_import(module, env=None, runs=5):
+    """
+    Time a cold import of a module, each run in a fresh interpreter.
+    
+    Args:
+        module (str): Module to import from the project root
+        env (dict): Extra environment variables for the child process
+        runs (int): Number of fresh interpreters to time
+    
+    Returns:
+        dict: Same keys as measure()
+    """
+    child_env = dict(os.environ, **(env or {}))
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIMER, module],
+            cwd=PROJECT_DIR,
+            env=child_env,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "runs": len(samples)
+    }
+
+
+def build_import_benchmarks():
+    """
+    Build the cold-start import cases.
+    
+    Returns:
+        dict: Benchmark name -> (module, extra environment)
+    """
+    return {
+        "import[app, lazy]": ("app", {"LAZY_IMPORTS": "1", "PREWARM_IMPORTS": "0"}),
+        "import[app, eager]": ("app", {"LAZY_IMPORTS": "0", "PREWARM_IMPORTS": "0"}),
+        "import[pdf_utils]": ("pdf_utils", None),
+        "import[cover_letter_agent]": ("cover_letter_agent", None),
+        "import[pdf_generator]": ("pdf_generator", None),
+    }
+
+
+def build_benchmarks():
+    """
+    Build the benchmark cases.
+    
+    Returns:
+        dict: Benchmark name -> zero-argument callable
+    """
+    # The agent's parsing helpers don't call the API, but the client needs a key to construct
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+    
+    from cover_letter_agent import CoverLetterAgent
+    from pdf_generator import create_cover_letter_pdf, export_cover_letters_zip, format_filename
+    from pdf_utils import extract_text_from_pdf, validate_pdf_content
+    
+    small_pdf = synthetic_cv_pdf(pages=2, lines_per_page=45)
+    large_pdf = synthetic_cv_pdf(pages=30, lines_per_page=55)
+    cv_text = extract_text_from_pdf(BytesIO(small_pdf))
+    scoring_output = synthetic_scoring_output(sentences=6)
+    cover_letter = synthetic_cover_letter(paragraphs=6)
+    letter_batch = [synthetic_cover_letter(paragraphs=5, seed=seed) for seed in range(20)]
+    
+    agent = CoverLetterAgent()
+    
+    return {
+        "extract_text_from_pdf[2 pages]": lambda: extract_text_from_pdf(BytesIO(small_pdf)),
+        "extract_text_from_pdf[30 pages]": lambda: extract_text_from_pdf(BytesIO(large_pdf)),
+        "validate_pdf_content": lambda: validate_pdf_content(cv_text),
+        "extract_applicant_name": lambda: agent.extract_applicant_name(cv_text),
+        "parse_scoring_result": lambda: agent._parse_scoring_result(scoring_output),
+        "create_cover_letter_pdf": lambda: create_cover_letter_pdf(cover_letter, "Alex Smith"),
+        "format_filename": lambda: format_filename("Dr. Alex-Jordan Smith"),
+        "export_cover_letters_zip[20 letters]": lambda: export_cover_letters_zip(letter_batch, BytesIO()),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline.
+    
+    Args:
+        results (dict): Benchmark name -> measurement
+        baseline (dict): Benchmark name -> measurement
+        threshold (float): Tolerated relative slowdown of the median
+    
+    Returns:
+        list: (name, baseline_ms, current_ms, ratio) for each regression
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        ratio = current["median_ms"] / max(reference["median_ms"], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append((name, reference["median_ms"], current["median_ms"], ratio))
+    return regressions
+
+
+def write_json(path, payload):
+    """Write a JSON document, creating the parent directory if needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the local hot paths.")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Tolerated relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--skip-imports", action="store_true", help="Skip the cold-start import benchmarks")
+    args = parser.parse_args(argv)
+    
+    results = {}
+    for name, func in build_benchmarks().items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(func)
+        print(f"{name:<40} median {results[name]['median_ms']:>10.3f} ms  ({results[name]['runs']} runs)")
+    
+    if not args.skip_imports:
+        for name, (module, env) in build_import_benchmarks().items():
+            if args.only and args.only not in name:
+                continue
+            results[name] = measure_import(module, env)
+            print(f"{name:<40} median {results[name]['median_ms']:>10.3f} ms  ({results[name]['runs']} runs)")
+    
+    payload = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+    write_json(args.output, payload)
+    
+    if args.update_baseline:
+        write_json(args.baseline, payload)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 0
+    
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    
+    regressions = compare(results, baseline, args.threshold)
+    for name, reference_ms, current_ms, ratio in regressions:
+        print(f"REGRESSION {name}: {reference_ms:.3f} ms -> {current_ms:.3f} ms ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
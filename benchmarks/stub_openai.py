@@ -0,0 +1,269 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Usage:
+    python -m benchmarks.stub_openai --port 8765 --latency 0.5 --tokens-per-second 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub streamlit run app.py
+
+Supports plain and streamed (server-sent events) completions, structured output
+via response_format json_schema or tool calls, configurable time-to-first-token
+and token rate, and injection of 5xx errors and 429 rate limits.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import synthetic_cover_letter, synthetic_scoring_output
+
+
+class StubSettings:
+    """Behaviour of the stub server."""
+    
+    def __init__(self, latency=0.3, tokens_per_second=100.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=None):
+        """
+        Args:
+            latency (float): Seconds before the first token
+            tokens_per_second (float): Output token rate (0 for instant)
+            error_rate (float): Probability of answering with HTTP 500
+            rate_limit_rate (float): Probability of answering with HTTP 429
+            retry_after (float): Retry-After value sent with 429 responses
+            seed (int): Random seed for error injection and content
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+    
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _value_for_schema(schema):
+    """Build a plausible value for a JSON schema fragment."""
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _value_for_schema(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "integer":
+        return 4
+    if kind == "number":
+        return 0.8
+    if kind == "boolean":
+        return True
+    if kind == "array":
+        return [_value_for_schema(schema.get("items", {}))]
+    return synthetic_scoring_output(sentences=1).split("\n")[1].split(": ", 1)[1][:200]
+
+
+def build_completion(request):
+    """
+    Decide the content of a completion from the request.
+    
+    Args:
+        request (dict): Chat completions request body
+    
+    Returns:
+        tuple: (content, tool_call) where exactly one is not None
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+    seed = len(prompt)
+    
+    tools = request.get("tools")
+    if tools:
+        function = tools[0]["function"]
+        arguments = json.dumps(_value_for_schema(function.get("parameters", {})))
+        return None, {"name": function["name"], "arguments": arguments}
+    
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps(_value_for_schema(response_format["json_schema"]["schema"])), None
+    
+    if "COVER LETTER:" in prompt:
+        return synthetic_scoring_output(seed=seed) + "COVER LETTER:\n" + synthetic_cover_letter(seed=seed), None
+    if "SCORE: [1-5]" in prompt:
+        return synthetic_scoring_output(seed=seed), None
+    return synthetic_cover_letter(seed=seed), None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler implementing POST /v1/chat/completions."""
+    
+    settings = StubSettings()
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        # Keep load-test output readable
+        pass
+    
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        settings = self.settings
+        
+        roll = settings.roll()
+        if roll < settings.rate_limit_rate:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                headers={"Retry-After": str(settings.retry_after)}
+            )
+            return
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            self._send_json(500, {"error": {"message": "Injected server error (stub)", "type": "server_error"}})
+            return
+        
+        content, tool_call = build_completion(request)
+        output = content if content is not None else tool_call["arguments"]
+        
+        # Respect max_tokens approximately by truncating the output
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+        if max_tokens and content is not None and _approx_tokens(content) > max_tokens:
+            content = output = content[:max_tokens * 4]
+        
+        usage = {
+            "prompt_tokens": _approx_tokens(json.dumps(request.get("messages", []))),
+            "completion_tokens": _approx_tokens(output),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        
+        time.sleep(settings.latency)
+        if request.get("stream"):
+            self._stream(request, content, tool_call, usage)
+        else:
+            if settings.tokens_per_second:
+                time.sleep(usage["completion_tokens"] / settings.tokens_per_second)
+            self._send_json(200, self._completion(request, content, tool_call, usage))
+    
+    def _completion(self, request, content, tool_call, usage):
+        message = {"role": "assistant", "content": content}
+        if tool_call:
+            message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": tool_call}]
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": usage
+        }
+    
+    def _stream(self, request, content, tool_call, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", "stub")}
+        
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        
+        # Emit roughly one token (4 characters) per chunk at the configured rate
+        text = content if content is not None else ""
+        delay = 1 / self.settings.tokens_per_second if self.settings.tokens_per_second else 0
+        send(json.dumps({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}))
+        for start in range(0, len(text), 4):
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": {"content": text[start:start + 4]}, "finish_reason": None}]}))
+            if delay:
+                time.sleep(delay)
+        if tool_call:
+            delta = {"tool_calls": [{"index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": tool_call}]}
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+        
+        send(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_call else "stop"}]}))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps({**base, "choices": [], "usage": usage}))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(settings=None, host="127.0.0.1", port=0):
+    """
+    Start the stub server in a background thread.
+    
+    Args:
+        settings (StubSettings): Server behaviour (defaults if None)
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free port)
+    
+    Returns:
+        tuple: (server, base_url) where base_url is suitable for OPENAI_BASE_URL
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"settings": settings or StubSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_stub_arguments(parser):
+    """Add the stub behaviour options to an argument parser."""
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Output token rate (0 for instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 500 response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of an HTTP 429 response")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+
+def settings_from_args(args):
+    """Build StubSettings from parsed add_stub_arguments() options."""
+    return StubSettings(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible chat completions stub.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    server, base_url = start_stub_server(settings_from_args(args), args.host, args.port)
+    print(f"Stub OpenAI server listening; set OPENAI_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
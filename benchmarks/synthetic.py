@@ -0,0 +1,127 @@
+"""
+Synthetic CVs and LLM outputs for benchmarks and load tests.
+"""
+
+import random
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+
+FIRST_NAMES = ["Alex", "Jordan", "Sam", "Taylor", "Morgan", "Casey", "Robin", "Jamie"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Okafor", "Novak", "Silva", "Kowalski", "Haddad"]
+
+SECTIONS = ["Experience", "Education", "Skills", "Projects", "Certificates", "Publications", "Achievements"]
+
+VOCABULARY = (
+    "led designed delivered migrated optimized analysed managed mentored built automated launched "
+    "python sql aws docker kubernetes react typescript spark airflow tableau excel salesforce "
+    "team project platform pipeline service customer revenue latency cost quality stakeholder "
+    "university degree master bachelor research thesis responsibility achievement qualification "
+    "increased reduced improved by 20% 35% 3x within budget across regions for clients"
+).split()
+
+
+def synthetic_cv_text(pages=2, lines_per_page=45, seed=0):
+    """
+    Generate CV-like text lines grouped by page.
+    
+    Args:
+        pages (int): Number of pages
+        lines_per_page (int): Text density per page
+        seed (int): Random seed for reproducible output
+    
+    Returns:
+        list: One list of text lines per page
+    """
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    contact = f"Email: {name.lower().replace(' ', '.')}@example.com | Phone: +1 555 0100 | LinkedIn"
+    
+    content = []
+    for page in range(pages):
+        lines = [name, contact] if page == 0 else []
+        while len(lines) < lines_per_page:
+            if len(lines) % 12 == 2:
+                lines.append(rng.choice(SECTIONS))
+            else:
+                lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 14))).capitalize() + ".")
+        content.append(lines)
+    return content
+
+
+def synthetic_cv_pdf(pages=2, lines_per_page=45, seed=0):
+    """
+    Render a synthetic CV as a PDF.
+    
+    Args:
+        pages (int): Number of pages
+        lines_per_page (int): Text density per page (at most ~55 fit on A4)
+        seed (int): Random seed for reproducible output
+    
+    Returns:
+        bytes: PDF file as bytes
+    """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    line_height = min(14, (height - 80) / max(lines_per_page, 1))
+    
+    for lines in synthetic_cv_text(pages, lines_per_page, seed):
+        pdf.setFont("Helvetica", min(10, line_height - 1))
+        for index, line in enumerate(lines):
+            pdf.drawString(40, height - 40 - index * line_height, line)
+        pdf.showPage()
+    
+    pdf.save()
+    return buffer.getvalue()
+
+
+def synthetic_scoring_output(score=4, sentences=4, seed=0):
+    """
+    Generate a free-form scoring response in the format the scoring prompt requests.
+    
+    Args:
+        score (int): Score to report
+        sentences (int): Sentences per section
+        seed (int): Random seed for reproducible output
+    
+    Returns:
+        str: Raw scoring response
+    """
+    rng = random.Random(seed)
+    
+    def paragraph():
+        return "\n".join(
+            " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(10, 18))).capitalize() + "."
+            for _ in range(sentences)
+        )
+    
+    return (
+        f"SCORE: {score}\n"
+        f"ANALYSIS: {paragraph()}\n"
+        f"STRENGTHS: {paragraph()}\n"
+        f"GAPS: {paragraph()}\n"
+        f"RECOMMENDATIONS: {paragraph()}\n"
+    )
+
+
+def synthetic_cover_letter(paragraphs=5, seed=0):
+    """
+    Generate a cover-letter-shaped text.
+    
+    Args:
+        paragraphs (int): Number of body paragraphs
+        seed (int): Random seed for reproducible output
+    
+    Returns:
+        str: Cover letter text with blank lines between paragraphs
+    """
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    body = [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(60, 90))).capitalize() + "."
+        for _ in range(paragraphs)
+    ]
+    return "\n\n".join([name, "Dear [Hiring Manager],"] + body + [f"Sincerely,\n{name}"])
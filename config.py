@@ -0,0 +1,12 @@
+"""
+Settings shared by modules that must stay cheap to import.
+"""
+
+import os
+
+
+# Minimum length of the CV and job description texts, in characters
+MIN_INPUT_CHARS = 50
+
+# Job store location (overridable through an environment variable)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(".cache", "job_store.sqlite3"))
@@ -2,22 +2,240 @@
 LangChain agent for generating cover letters based on CV and job description.
 """
 
+import hashlib
 import os
+import re
+import threading
+from collections import OrderedDict
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from pydantic import BaseModel, Field, field_validator
 import streamlit as st
+from config import MIN_INPUT_CHARS
+from instrumentation import span
+from llm_cache import get_response_cache
+from model_router import RETRIES_BEFORE_FALLBACK, ModelRouter, should_fall_back
+from rate_limiter import get_rate_limiter
+from relevance import relevant_passages
+from token_budget import INPUT_TOKEN_BUDGET, count_tokens, fit_to_budget
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Separates the assessment from the letter in combined scoring + generation responses
+COVER_LETTER_MARKER = "COVER LETTER:"
+
+# Output limits for structured scoring
+SCORING_MAX_TOKENS = 600
+SCORING_FIELD_MAX_CHARS = 400
+
+SCORE_RE = re.compile(r'(\d+)')
+
+# Paragraph rewriting: output limit and CV passages sent as context
+PARAGRAPH_MAX_TOKENS = 400
+PARAGRAPH_CV_PASSAGES = 3
+
+PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+# CV digest: output limit, list lengths, and digests kept in memory per process
+DIGEST_MAX_TOKENS = 900
+DIGEST_LIST_MAX_ITEMS = 25
+DIGEST_MEMO_MAX_ENTRIES = 128
+
+# First line of a digest profile, holding the applicant's name
+DIGEST_NAME_FIELD = "Name:"
+
+_digest_memo = OrderedDict()
+_digest_memo_lock = threading.Lock()
+_digest_key_locks = {}
+
+# Output limits of letters, free-form scoring and combined scoring + letter responses
+LETTER_MAX_TOKENS = 1500
+FREEFORM_SCORING_MAX_TOKENS = 800
+COMBINED_MAX_TOKENS = 2000
+
+# Request timeouts in seconds of the short analysis tasks and of the letter-writing
+# tasks; a request that times out moves on to the route's fallback model
+ANALYSIS_TIMEOUT_SECONDS = 30
+LETTER_TIMEOUT_SECONDS = 60
+
+# Model and request parameters per task, overridable through the environment
+# (see ModelRouter.from_env); routes that name no model use the agent's model
+DEFAULT_ROUTES = {
+    "cover_letter": [{"max_tokens": LETTER_MAX_TOKENS, "timeout": LETTER_TIMEOUT_SECONDS}],
+    "scoring": [{"max_tokens": FREEFORM_SCORING_MAX_TOKENS, "timeout": ANALYSIS_TIMEOUT_SECONDS}],
+    "structured_scoring": [{"max_tokens": SCORING_MAX_TOKENS, "timeout": ANALYSIS_TIMEOUT_SECONDS}],
+    "score_and_generate": [{"max_tokens": COMBINED_MAX_TOKENS, "timeout": LETTER_TIMEOUT_SECONDS}],
+    "paragraph": [{"max_tokens": PARAGRAPH_MAX_TOKENS, "timeout": ANALYSIS_TIMEOUT_SECONDS}],
+    # Digests are deterministic and independent of the agent's temperature
+    "cv_digest": [{"max_tokens": DIGEST_MAX_TOKENS, "temperature": 0, "timeout": ANALYSIS_TIMEOUT_SECONDS}]
+}
+
+# Shared start of the CV/job prompts. The parts that stay the same across calls
+# for one CV and job come first, so the provider can reuse its cached prompt prefix.
+PROMPT_CONTEXT_PREFIX = """
+You are an expert HR professional, career advisor and cover letter writer.
+
+CV Content:
+{cv_content}
+
+Job Description:
+{job_description}
+"""
+
+# Connection pool limits for the shared HTTP client used by all agents
+HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("OPENAI_HTTP_TIMEOUT", "120"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    """
+    Get the process-wide pooled HTTP client for OpenAI requests.
+    
+    Sharing one client keeps TLS connections alive across requests and
+    sessions instead of opening a new connection per agent.
+    
+    Returns:
+        httpx.Client: Shared keep-alive HTTP client
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=HTTP_TIMEOUT
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _cached_agent(model, temperature):
+    """Build an agent for a (model, temperature) pair; see get_agent()."""
+    return CoverLetterAgent(
+        temperature=temperature,
+        model=model,
+        http_client=get_http_client(),
+        response_cache=get_response_cache()
+    )
+
+
+def get_agent(temperature=0.7, model=DEFAULT_MODEL):
+    """
+    Get a shared CoverLetterAgent for the given model and temperature.
+    
+    Agents hold no per-request state, so one instance per (model, temperature)
+    is reused across reruns and sessions, avoiding client, prompt and chain
+    setup on every click.
+    
+    Args:
+        temperature (float): Temperature parameter for LLM (0.0 to 1.0)
+        model (str): OpenAI chat model name
+        
+    Returns:
+        CoverLetterAgent: Cached agent instance
+    """
+    # Round so float noise from widgets doesn't create duplicate entries
+    return _cached_agent(model, round(float(temperature), 2))
+
+
+class CVMatchScore(BaseModel):
+    """Compact, schema-constrained CV match assessment."""
+    
+    score: int = Field(description="Overall fit from 1 (poor match) to 5 (perfect match)")
+    analysis: str = Field(description="Scoring rationale in at most 50 words")
+    strengths: str = Field(description="Key matching points between CV and job in at most 40 words")
+    gaps: str = Field(description="Requirements the CV does not fully meet in at most 40 words")
+    recommendations: str = Field(description="Suggestions to improve the application in at most 40 words")
+    
+    @field_validator("score")
+    @classmethod
+    def _clamp_score(cls, value):
+        return max(1, min(5, value))
+    
+    @field_validator("analysis", "strengths", "gaps", "recommendations")
+    @classmethod
+    def _bound_length(cls, value):
+        value = " ".join(value.split())
+        if len(value) > SCORING_FIELD_MAX_CHARS:
+            value = value[:SCORING_FIELD_MAX_CHARS].rsplit(" ", 1)[0] + "…"
+        return value
+    
+    @property
+    def stars(self):
+        return "⭐" * self.score
+    
+    def to_dict(self):
+        """
+        Convert to the dictionary format returned by score_cv_match().
+        
+        Returns:
+            dict: Dictionary containing score, stars, analysis, strengths, gaps, and recommendations
+        """
+        return {
+            "score": self.score,
+            "stars": self.stars,
+            "analysis": self.analysis,
+            "strengths": self.strengths,
+            "gaps": self.gaps,
+            "recommendations": self.recommendations
+        }
+
+
+class CVDigest(BaseModel):
+    """Compact structured profile of a CV, used in prompts instead of the raw text."""
+    
+    name: str = Field(description="Applicant's full name, or an empty string if not stated")
+    headline: str = Field(description="Current or target role and seniority in at most 12 words")
+    roles: list[str] = Field(description="Most recent roles, newest first, as 'Title, Employer, years: main responsibility'")
+    skills: list[str] = Field(description="Skills, tools, technologies and languages")
+    achievements: list[str] = Field(description="Most notable achievements, with numbers where the CV gives them")
+    education: list[str] = Field(description="Degrees and certifications with institution and year")
+    
+    @field_validator("roles", "skills", "achievements", "education")
+    @classmethod
+    def _bound_items(cls, value):
+        return [" ".join(item.split())[:SCORING_FIELD_MAX_CHARS] for item in value if item.strip()][:DIGEST_LIST_MAX_ITEMS]
+    
+    def to_prompt(self):
+        """
+        Render the profile as compact prompt text.
+        
+        The first line is always the Name field (empty if unknown), which
+        extract_applicant_name() reads instead of guessing from the text.
+        
+        Returns:
+            str: Profile text
+        """
+        lines = [f"{DIGEST_NAME_FIELD} {' '.join(self.name.split())}".rstrip()]
+        lines.append(f"Headline: {self.headline}")
+        lines.extend(f"Role: {role}" for role in self.roles)
+        lines.append(f"Skills: {', '.join(self.skills)}")
+        lines.extend(f"Achievement: {achievement}" for achievement in self.achievements)
+        lines.extend(f"Education: {entry}" for entry in self.education)
+        return "\n".join(lines)
 
 
 class CoverLetterAgent:
     """Agent responsible for generating cover letters using OpenAI and LangChain."""
     
-    def __init__(self, api_key=None, temperature=0.7):
+    def __init__(self, api_key=None, temperature=0.7, model=DEFAULT_MODEL, http_client=None, response_cache=None, rate_limiter=None, router=None):
         """
         Initialize the cover letter agent.
         
         Args:
             api_key (str): OpenAI API key
             temperature (float): Temperature parameter for LLM (0.0 to 1.0)
+            model (str): OpenAI chat model name
+            http_client (httpx.Client): Optional shared HTTP client for connection reuse
+            response_cache (LLMResponseCache): Optional persistent cache for LLM responses
+            rate_limiter (RateLimiter): Limiter for all of this agent's requests (defaults to
+                the process-wide limiter of each model)
+            router (ModelRouter): Model and parameters per task (defaults to DEFAULT_ROUTES
+                with the environment's overrides)
         """
         if api_key:
             os.environ["OPENAI_API_KEY"] = api_key
@@ -32,26 +250,24 @@ class CoverLetterAgent:
                 # Streamlit secrets not available, rely on environment variables
                 pass
         
-        # Initialize the OpenAI chat model
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=temperature,
-            max_tokens=8000
-        )
+        # Default model and settings; routes pick the model and limits per task
+        self.model = model
+        self.temperature = temperature
+        self.http_client = http_client
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.router = router or ModelRouter.from_env(DEFAULT_ROUTES)
+        
+        # Chains per (task, model, parameters), created on first use
+        self._chains = {}
+        self._chains_lock = threading.Lock()
         
         # Define the prompt template for cover letter generation
         self.prompt_template = PromptTemplate(
             input_variables=["cv_content", "job_description", "applicant_name", "tone"],
-            template="""
-You are an expert career advisor and cover letter writer. Based on the provided CV and job description, 
-create a professional, compelling cover letter that highlights the applicant's most relevant qualifications 
-and demonstrates their suitability for the position.
-
-CV Content:
-{cv_content}
-
-Job Description:
-{job_description}
+            template=PROMPT_CONTEXT_PREFIX + """
+Task: Based on the CV and job description above, create a professional, compelling cover letter that highlights 
+the applicant's most relevant qualifications and demonstrates their suitability for the position.
 
 Tone Instructions:
 {tone}
@@ -74,20 +290,11 @@ Generate a professional cover letter:
             """
         )
         
-        # Create the modern LangChain chain using prompt | llm
-        self.chain = self.prompt_template | self.llm
-        
         # Define the prompt template for CV scoring
         self.scoring_prompt_template = PromptTemplate(
             input_variables=["cv_content", "job_description"],
-            template="""
-You are an expert HR professional and career advisor. Analyze how well the provided CV matches the job description and provide a detailed scoring assessment.
-
-CV Content:
-{cv_content}
-
-Job Description:
-{job_description}
+            template=PROMPT_CONTEXT_PREFIX + """
+Task: Analyze how well the CV above matches the job description and provide a detailed scoring assessment.
 
 Instructions:
 1. Carefully analyze the alignment between the CV and job description
@@ -118,8 +325,110 @@ Provide your assessment:
             """
         )
         
-        # Create the modern scoring chain using prompt | llm
-        self.scoring_chain = self.scoring_prompt_template | self.llm
+        # Define the compact prompt for schema-constrained scoring; the output
+        # format comes from the CVMatchScore schema rather than the prompt
+        self.structured_scoring_prompt_template = PromptTemplate(
+            input_variables=["cv_content", "job_description"],
+            template=PROMPT_CONTEXT_PREFIX + """
+Task: Assess how well the CV matches the job description, considering required skills and qualifications, 
+experience level, education, domain knowledge, technical skills, soft skills and the relevance of career 
+achievements. Score 1 = poor match, 2 = below average, 3 = good, 4 = excellent, 5 = perfect match. 
+Be concise and respect the word limits of each field.
+            """
+        )
+        
+        # Define the prompt template for scoring and writing in a single request
+        self.combined_prompt_template = PromptTemplate(
+            input_variables=["cv_content", "job_description", "applicant_name", "tone"],
+            template=PROMPT_CONTEXT_PREFIX + """
+Task: First assess how well the CV above matches the job description, then write a tailored cover letter 
+for the position.
+
+Tone Instructions:
+{tone}
+
+Applicant Name (if identified): {applicant_name}
+
+Part 1 - Match assessment:
+Consider required skills and qualifications, experience level, education, domain knowledge, technical skills, 
+soft skills and the relevance of career achievements. Score the overall fit from 1 to 5:
+1 = Poor match, 2 = Below average, 3 = Good match, 4 = Excellent match, 5 = Perfect match.
+
+Part 2 - Cover letter:
+1. Write a comprehensive cover letter of approximately 4-6 paragraphs following the specified tone
+2. Use specific examples of skills, experiences and achievements from the CV that match the job requirements
+3. Open strongly, show genuine enthusiasm for the role, and end with a confident call to action
+4. If the applicant's name is not clearly identifiable from the CV, use "[Your Name]" as a placeholder
+5. Use "[Company Name]" and "[Hiring Manager]" as placeholders if not specified in the job description
+
+Your response MUST follow this exact format:
+SCORE: [1-5]
+ANALYSIS: [Explanation of the scoring rationale]
+STRENGTHS: [Key matching points between CV and job]
+GAPS: [Areas where CV doesn't fully meet job requirements]
+RECOMMENDATIONS: [Suggestions to improve the application]
+{letter_marker}
+[The complete cover letter]
+            """,
+            partial_variables={"letter_marker": COVER_LETTER_MARKER}
+        )
+        
+        # Define the prompt template for the one-time CV digest
+        self.digest_prompt_template = PromptTemplate(
+            input_variables=["cv_content"],
+            template="""
+You are an expert CV analyst. Condense the CV into a compact, factual profile that can stand in for the full CV 
+when assessing job matches and writing cover letters. Keep every role, skill, achievement and qualification that 
+an employer could care about, drop formatting and filler, and never invent facts.
+
+CV Content:
+{cv_content}
+            """
+        )
+        
+        # Define the prompt template for rewriting a single paragraph
+        self.paragraph_prompt_template = PromptTemplate(
+            input_variables=["cv_excerpt", "previous_paragraph", "paragraph", "next_paragraph", "tone", "instructions"],
+            template="""
+You are an expert cover letter writer. Rewrite one paragraph of a cover letter so it fits between its neighbours 
+and is grounded in the applicant's CV. Keep roughly the same length and purpose, follow the tone, and do not repeat 
+points made in the neighbouring paragraphs.
+
+Relevant CV excerpt:
+{cv_excerpt}
+
+Tone Instructions:
+{tone}
+
+Additional instructions from the applicant:
+{instructions}
+
+Previous paragraph:
+{previous_paragraph}
+
+Paragraph to rewrite:
+{paragraph}
+
+Next paragraph:
+{next_paragraph}
+
+Reply with the rewritten paragraph only:
+            """
+        )
+        
+        # Prompt of each routed task, and the schemas of the structured ones
+        self.task_prompts = {
+            "cover_letter": self.prompt_template,
+            "scoring": self.scoring_prompt_template,
+            "structured_scoring": self.structured_scoring_prompt_template,
+            "score_and_generate": self.combined_prompt_template,
+            "paragraph": self.paragraph_prompt_template,
+            "cv_digest": self.digest_prompt_template
+        }
+        self.output_schemas = {
+            "structured_scoring": CVMatchScore,
+            "cv_digest": CVDigest
+        }
     
     def extract_applicant_name(self, cv_text):
         """
@@ -131,6 +440,11 @@ Provide your assessment:
         Returns:
             str: The applicant's name or None if not found
         """
+        # A CV digest states the name explicitly (see CVDigest.to_prompt)
+        if cv_text.startswith(DIGEST_NAME_FIELD):
+            name = cv_text.split('\n', 1)[0][len(DIGEST_NAME_FIELD):].strip()
+            return name or None
+        
         # Simple name extraction - look for name patterns at the beginning of the CV
         lines = cv_text.split('\n')[:5]  # Check first 5 lines
         
@@ -149,7 +463,7 @@ Provide your assessment:
         
         return None
     
-    def generate_cover_letter(self, cv_content, job_description, tone="Professional and confident"):
+    def generate_cover_letter(self, cv_content, job_description, tone="Professional and confident", use_cache=True):
         """
         Generate a cover letter based on CV content and job description.
         
@@ -157,29 +471,230 @@ Provide your assessment:
             cv_content (str): Extracted text from the CV
             job_description (str): Job description text
             tone (str): Tone/style for the cover letter
+            use_cache (bool): Whether a cached response may be returned
             
         Returns:
             str: Generated cover letter
         """
         try:
-            # Extract applicant name
-            applicant_name = self.extract_applicant_name(cv_content)
-            
             # Generate the cover letter using the modern chain
-            result = self.chain.invoke({
-                "cv_content": cv_content,
-                "job_description": job_description,
-                "applicant_name": applicant_name or "[Your Name]",
-                "tone": tone
-            })
+            return self._invoke(
+                "cover_letter",
+                self._cover_letter_inputs(cv_content, job_description, tone),
+                use_cache=use_cache
+            )
+            
+        except Exception as e:
+            st.error(f"Error generating cover letter: {str(e)}")
+            return None
+    
+    def stream_cover_letter(self, cv_content, job_description, tone="Professional and confident", use_cache=True, raise_errors=False):
+        """
+        Stream a cover letter token by token as the model produces it.
+        
+        A cached response is yielded as a single chunk.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            tone (str): Tone/style for the cover letter
+            use_cache (bool): Whether a cached response may be returned
+            raise_errors (bool): Raise errors instead of reporting them in the UI;
+                otherwise an error ends the stream early and the text received so
+                far is incomplete
+            
+        Yields:
+            str: Successive chunks of the generated cover letter
+        """
+        try:
+            variables = self._cover_letter_inputs(cv_content, job_description, tone)
+            with span("prompt_render", task="cover_letter", model=self.model):
+                route, prompt, input_tokens = self._prepare("cover_letter", variables)
+                cache_key = self._cache_key(prompt, route)
+            
+            cached = self._cache_lookup(cache_key, use_cache)
+            if cached is not None:
+                yield cached
+                return
             
-            # Extract content from AIMessage object
-            return result.content
+            chunks = []
+            with span("llm_call", task="cover_letter", model=self.model, streamed=True) as current:
+                for chunk in self._stream("cover_letter", route, variables, input_tokens, current):
+                    # Each chunk is an AIMessageChunk carrying a slice of the content;
+                    # the last one carries the token usage
+                    current.record_usage(chunk)
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield chunk.content
             
+            # Only a fully received letter is cached
+            self._cache_store(self._answer_cache_key(cache_key, prompt, route, current), "".join(chunks))
+                    
         except Exception as e:
+            if raise_errors:
+                raise
             st.error(f"Error generating cover letter: {str(e)}")
+    
+    def regenerate_paragraph(self, cover_letter, index, cv_content, tone="Professional and confident", instructions="", use_cache=True, raise_errors=False):
+        """
+        Rewrite one paragraph of a cover letter.
+        
+        Only the neighbouring paragraphs and the CV passages most relevant to the
+        paragraph are sent, not the whole letter, CV and job description.
+        
+        Args:
+            cover_letter (str): Current cover letter
+            index (int): Index of the paragraph in split_paragraphs(cover_letter)
+            cv_content (str): Extracted text from the CV
+            tone (str): Tone/style for the paragraph
+            instructions (str): Optional guidance, e.g. "mention my leadership experience"
+            use_cache (bool): Whether a cached response may be returned
+            raise_errors (bool): Raise errors instead of reporting them in the UI
+            
+        Returns:
+            str: Rewritten paragraph, or None on failure
+        """
+        try:
+            paragraphs = split_paragraphs(cover_letter)
+            if not 0 <= index < len(paragraphs):
+                raise IndexError(f"Paragraph {index + 1} does not exist")
+            
+            paragraph = paragraphs[index]
+            variables = {
+                "cv_excerpt": relevant_passages(cv_content, f"{paragraph} {instructions}", top_k=PARAGRAPH_CV_PASSAGES),
+                "previous_paragraph": paragraphs[index - 1] if index > 0 else "(start of letter)",
+                "paragraph": paragraph,
+                "next_paragraph": paragraphs[index + 1] if index + 1 < len(paragraphs) else "(end of letter)",
+                "tone": tone,
+                "instructions": instructions.strip() or "None"
+            }
+            
+            return self._invoke("paragraph", variables, use_cache=use_cache).strip()
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"Error rewriting paragraph: {str(e)}")
             return None
     
+    def _cover_letter_inputs(self, cv_content, job_description, tone):
+        """
+        Build the variables for the cover letter prompt.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            tone (str): Tone/style for the cover letter
+            
+        Returns:
+            dict: Prompt variables for the cover letter chain
+        """
+        # Extract applicant name
+        applicant_name = self.extract_applicant_name(cv_content)
+        
+        return {
+            "cv_content": cv_content,
+            "job_description": job_description,
+            "applicant_name": applicant_name or "[Your Name]",
+            "tone": tone
+        }
+    
+    def cv_digest(self, cv_content, use_cache=True, raise_errors=False):
+        """
+        Get the compact CV profile to send in place of the raw CV text.
+        
+        The profile is created once per CV and model, then served from memory
+        or the response cache for every later call in any session. Concurrent
+        calls for the same CV, e.g. from letter variants, wait for one request.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            use_cache (bool): Whether a cached digest may be returned
+            raise_errors (bool): Raise errors instead of reporting them in the UI
+            
+        Returns:
+            str: Profile text from CVDigest.to_prompt(), or None on failure
+        """
+        memo_key = (self.model, hashlib.sha256(cv_content.encode("utf-8")).hexdigest())
+        with _digest_memo_lock:
+            key_lock = _digest_key_locks.setdefault(memo_key, threading.Lock())
+        
+        with key_lock:
+            try:
+                if use_cache:
+                    with _digest_memo_lock:
+                        if memo_key in _digest_memo:
+                            _digest_memo.move_to_end(memo_key)
+                            return _digest_memo[memo_key]
+                
+                return self._create_cv_digest(cv_content, memo_key, use_cache, raise_errors)
+            finally:
+                with _digest_memo_lock:
+                    _digest_key_locks.pop(memo_key, None)
+    
+    def _create_cv_digest(self, cv_content, memo_key, use_cache, raise_errors):
+        """Request the CV digest (or read it from the response cache) and memoize its profile."""
+        variables = {"cv_content": cv_content}
+        try:
+            with span("prompt_render", task="cv_digest", model=self.model):
+                route, prompt, input_tokens = self._prepare("cv_digest", variables)
+                cache_key = self._cache_key(prompt, route)
+            
+            cached = self._cache_lookup(cache_key, use_cache)
+            if cached is not None:
+                digest = CVDigest.model_validate_json(cached)
+            else:
+                with span("llm_call", task="cv_digest", model=self.model) as current:
+                    output = self._send("cv_digest", route, variables, input_tokens, current)
+                    digest = self._structured_result(output, current)
+                self._cache_store(self._answer_cache_key(cache_key, prompt, route, current), digest.model_dump_json())
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"Error summarizing CV: {str(e)}")
+            return None
+        
+        profile = digest.to_prompt()
+        with _digest_memo_lock:
+            _digest_memo[memo_key] = profile
+            while len(_digest_memo) > DIGEST_MEMO_MAX_ENTRIES:
+                _digest_memo.popitem(last=False)
+        return profile
+    
+    def prepare_inputs(self, cv_content, job_description, use_digest=True, raise_errors=False):
+        """
+        Pick the CV text to send and fit both inputs to the input token budget.
+        
+        With use_digest, the CV digest replaces the raw CV text when it has
+        fewer tokens. This may make an LLM call, so background jobs run it in
+        their worker.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            use_digest (bool): Send the compact CV profile when it is shorter
+            raise_errors (bool): Raise errors instead of reporting them in the UI
+            
+        Returns:
+            tuple: (cv_content, job_description, report) where report is the
+                fit_inputs() report plus "digest", holding the CV and profile
+                token counts and whether the profile was used (None without one)
+        """
+        digest_report = None
+        if use_digest:
+            profile = self.cv_digest(cv_content, raise_errors=raise_errors)
+            if profile:
+                profile_tokens = count_tokens(profile, self.model)
+                cv_tokens = count_tokens(cv_content, self.model)
+                digest_report = {"cv_tokens": cv_tokens, "profile_tokens": profile_tokens, "used": profile_tokens < cv_tokens}
+                if digest_report["used"]:
+                    cv_content = profile
+        
+        cv_content, job_description, report = self.fit_inputs(cv_content, job_description)
+        report["digest"] = digest_report
+        return cv_content, job_description, report
+    
     def validate_inputs(self, cv_content, job_description):
         """
         Validate that the inputs are sufficient for cover letter generation.
@@ -191,56 +706,489 @@ Provide your assessment:
         Returns:
             tuple: (is_valid, error_message)
         """
-        if not cv_content or len(cv_content.strip()) < 50:
+        if not cv_content or len(cv_content.strip()) < MIN_INPUT_CHARS:
             return False, "CV content is too short or empty. Please upload a valid CV."
         
-        if not job_description or len(job_description.strip()) < 50:
+        if not job_description or len(job_description.strip()) < MIN_INPUT_CHARS:
             return False, "Job description is too short or empty. Please provide a detailed job description."
         
         return True, None
     
-    def score_cv_match(self, cv_content, job_description):
+    def fit_inputs(self, cv_content, job_description, budget=INPUT_TOKEN_BUDGET):
+        """
+        Compact the CV and job description to fit the input token budget.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            budget (int): Maximum input tokens per prompt
+            
+        Returns:
+            tuple: (cv_content, job_description, report) where report holds
+                per-component token counts before and after compaction
+        """
+        # The longest template, rendered without the variable inputs
+        overhead_tokens = max(
+            count_tokens(self.prompt_template.format(cv_content="", job_description="", applicant_name="", tone=""), self.model),
+            count_tokens(self.scoring_prompt_template.format(cv_content="", job_description=""), self.model),
+            count_tokens(self.combined_prompt_template.format(cv_content="", job_description="", applicant_name="", tone=""), self.model)
+        )
+        
+        fitted, report = fit_to_budget(
+            {"cv_content": cv_content, "job_description": job_description},
+            budget=budget,
+            model=self.model,
+            overhead_tokens=overhead_tokens
+        )
+        return fitted["cv_content"], fitted["job_description"], report
+    
+    def score_cv_match(self, cv_content, job_description, use_cache=True):
         """
         Score how well the CV matches the job description out of 5 stars.
         
         Args:
             cv_content (str): Extracted text from the CV
             job_description (str): Job description text
+            use_cache (bool): Whether a cached response may be returned
             
         Returns:
             dict: Dictionary containing score, analysis, strengths, gaps, and recommendations
         """
         try:
             # Generate the scoring assessment using the modern chain
-            result = self.scoring_chain.invoke({
-                "cv_content": cv_content,
-                "job_description": job_description
-            })
+            result = self._invoke(
+                "scoring",
+                {
+                    "cv_content": cv_content,
+                    "job_description": job_description
+                },
+                use_cache=use_cache
+            )
             
-            # Extract content from AIMessage object and parse the structured response
-            parsed_result = self._parse_scoring_result(result.content)
+            # Parse the structured response
+            with span("result_parse", task="scoring"):
+                parsed_result = self._parse_scoring_result(result)
             return parsed_result
             
         except Exception as e:
             st.error(f"Error scoring CV match: {str(e)}")
-            return {
-                "score": 0,
-                "stars": "",
-                "analysis": "Error occurred during scoring",
-                "strengths": "Unable to analyze",
-                "gaps": "Unable to analyze", 
-                "recommendations": "Please try again"
-            }
+            return self._scoring_error_result()
+    
+    def score_and_generate(self, cv_content, job_description, tone="Professional and confident", use_cache=True, raise_errors=False):
+        """
+        Score the CV match and write the cover letter in a single request.
+        
+        Sends the CV and job description once instead of once per task.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            tone (str): Tone/style for the cover letter
+            use_cache (bool): Whether a cached response may be returned
+            raise_errors (bool): Raise errors instead of reporting them in the UI
+            
+        Returns:
+            tuple: (scoring_result, cover_letter) where scoring_result has the same
+                keys as score_cv_match() and cover_letter is None on failure
+        """
+        try:
+            # Parsed before it is cached, so a malformed reply is asked for again next time
+            return self._invoke(
+                "score_and_generate",
+                self._cover_letter_inputs(cv_content, job_description, tone),
+                use_cache=use_cache,
+                parse=self._parse_combined_result
+            )
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"Error generating analysis and cover letter: {str(e)}")
+            return self._scoring_error_result(), None
     
-    def _parse_scoring_result(self, result):
+    def _parse_combined_result(self, result):
+        """
+        Split a combined response into the assessment and the cover letter.
+        
+        Args:
+            result (str): Raw response of the score_and_generate task
+            
+        Returns:
+            tuple: (scoring_result, cover_letter)
+            
+        Raises:
+            ValueError: If the response has no cover letter section or no score
+        """
+        with span("result_parse", task="score_and_generate"):
+            assessment, marker, cover_letter = result.partition(COVER_LETTER_MARKER)
+            if not marker:
+                raise ValueError("Response did not contain a cover letter section")
+            return self._parse_scoring_result(assessment, require_score=True), cover_letter.strip()
+    
+    def _scoring_error_result(self):
+        """
+        Build the scoring result reported when scoring fails.
+        
+        Returns:
+            dict: Scoring result with a zero score and error messages
+        """
+        return {
+            "score": 0,
+            "stars": "",
+            "analysis": "Error occurred during scoring",
+            "strengths": "Unable to analyze",
+            "gaps": "Unable to analyze", 
+            "recommendations": "Please try again"
+        }
+    
+    def score_cv_match_structured(self, cv_content, job_description, use_cache=True, raise_errors=False):
+        """
+        Score the CV match using schema-constrained structured output.
+        
+        The response is validated against CVMatchScore, so there is no free-form
+        text to parse and no silent fallback score.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            use_cache (bool): Whether a cached response may be returned
+            raise_errors (bool): Raise errors instead of reporting them in the UI
+            
+        Returns:
+            CVMatchScore: Typed scoring result, or None on failure
+        """
+        variables = {"cv_content": cv_content, "job_description": job_description}
+        
+        try:
+            with span("prompt_render", task="structured_scoring", model=self.model):
+                route, prompt, input_tokens = self._prepare("structured_scoring", variables)
+                cache_key = self._cache_key(prompt, route)
+            
+            cached = self._cache_lookup(cache_key, use_cache)
+            if cached is not None:
+                return CVMatchScore.model_validate_json(cached)
+            
+            with span("llm_call", task="structured_scoring", model=self.model) as current:
+                output = self._send("structured_scoring", route, variables, input_tokens, current)
+                result = self._structured_result(output, current)
+            self._cache_store(self._answer_cache_key(cache_key, prompt, route, current), result.model_dump_json())
+            return result
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"Error scoring CV match: {str(e)}")
+            return None
+    
+    async def ascore_cv_match(self, cv_content, job_description, use_cache=True):
+        """
+        Asynchronously score how well the CV matches the job description.
+        
+        Uses structured output. Unlike score_cv_match(), errors are raised
+        rather than reported in the UI, so batch callers can record them per job.
+        
+        Args:
+            cv_content (str): Extracted text from the CV
+            job_description (str): Job description text
+            use_cache (bool): Whether a cached response may be returned
+            
+        Returns:
+            dict: Dictionary containing score, stars, analysis, strengths, gaps, and recommendations
+        """
+        variables = {"cv_content": cv_content, "job_description": job_description}
+        with span("prompt_render", task="structured_scoring", model=self.model):
+            route, prompt, input_tokens = self._prepare("structured_scoring", variables)
+            cache_key = self._cache_key(prompt, route)
+        
+        cached = self._cache_lookup(cache_key, use_cache)
+        if cached is not None:
+            return CVMatchScore.model_validate_json(cached).to_dict()
+        
+        with span("llm_call", task="structured_scoring", model=self.model) as current:
+            output = await self._asend("structured_scoring", route, variables, input_tokens, current)
+            result = self._structured_result(output, current)
+        self._cache_store(self._answer_cache_key(cache_key, prompt, route, current), result.model_dump_json())
+        return result.to_dict()
+    
+    def _structured_result(self, output, current_span):
+        """
+        Unpack the output of a structured output chain.
+        
+        Args:
+            output (dict): Chain output with "raw", "parsed" and "parsing_error" keys
+            current_span (Span): Span that receives the token usage of the raw response
+            
+        Returns:
+            BaseModel: Validated result (CVMatchScore or CVDigest)
+        """
+        current_span.record_usage(output["raw"])
+        if output.get("parsing_error") is not None:
+            raise output["parsing_error"]
+        if output.get("parsed") is None:
+            raise ValueError("Model returned no structured result")
+        return output["parsed"]
+    
+    def _invoke(self, task, variables, use_cache=True, parse=None):
+        """
+        Run a free-form task, serving and storing responses through the response cache.
+        
+        Args:
+            task (str): Task name, a key of task_prompts
+            variables (dict): Prompt variables
+            use_cache (bool): Whether a cached response may be returned;
+                a fresh response is still written back to the cache
+            parse (callable): Turns the response content into the result and
+                raises if it is malformed; only responses it accepts are cached
+            
+        Returns:
+            Response content, or parse(content) when parse is given
+        """
+        with span("prompt_render", task=task, model=self.model):
+            route, prompt, input_tokens = self._prepare(task, variables)
+            cache_key = self._cache_key(prompt, route)
+        
+        cached = self._cache_lookup(cache_key, use_cache)
+        if cached is not None:
+            try:
+                return parse(cached) if parse else cached
+            except Exception:
+                # Malformed entry from before responses were checked: ask again
+                pass
+        
+        with span("llm_call", task=task, model=self.model) as current:
+            message = self._send(task, route, variables, input_tokens, current)
+            current.record_usage(message)
+        
+        # Extract content from AIMessage object
+        content = message.content
+        result = parse(content) if parse else content
+        self._cache_store(self._answer_cache_key(cache_key, prompt, route, current), content)
+        return result
+    
+    def _prepare(self, task, variables):
+        """
+        Render a task's prompt and pick its route by prompt size.
+        
+        Args:
+            task (str): Task name, a key of task_prompts
+            variables (dict): Prompt variables
+            
+        Returns:
+            tuple: (route, prompt, input_tokens)
+        """
+        prompt = self.task_prompts[task].format(**variables)
+        input_tokens = count_tokens(prompt, self.model)
+        return self.router.select(task, input_tokens), prompt, input_tokens
+    
+    def _route_temperature(self, route):
+        """The route's temperature, or the agent's if the route sets none."""
+        return self.temperature if route.temperature is None else route.temperature
+    
+    def _chain(self, task, model, route):
+        """
+        Get the chain for a task on a model with the route's parameters.
+        
+        Args:
+            task (str): Task name, a key of task_prompts
+            model (str): OpenAI chat model name
+            route (Route): Route supplying the output limit, temperature and timeout
+            
+        Returns:
+            Runnable: prompt | model, with structured output for tasks in output_schemas
+        """
+        temperature = self._route_temperature(route)
+        key = (task, model, temperature, route.max_tokens, route.timeout)
+        with self._chains_lock:
+            chain = self._chains.get(key)
+            if chain is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=route.max_tokens,
+                    timeout=route.timeout,
+                    http_client=self.http_client,
+                    # Retries are left to the rate limiter, which knows about the other requests in flight
+                    max_retries=0,
+                    # Report token usage on the final chunk of streamed responses
+                    stream_usage=True
+                )
+                schema = self.output_schemas.get(task)
+                if schema is not None:
+                    # include_raw keeps the AIMessage so its token usage can be recorded
+                    llm = llm.with_structured_output(schema, include_raw=True)
+                chain = self._chains[key] = self.task_prompts[task] | llm
+        return chain
+    
+    def _limiter(self, model):
+        """The rate limiter for requests to a model."""
+        return self.rate_limiter or get_rate_limiter(model)
+    
+    def _send(self, task, route, variables, input_tokens, current_span):
+        """
+        Send a request along a route, moving on to the next model if one fails.
+        
+        Args:
+            task (str): Task name
+            route (Route): Selected route
+            variables (dict): Prompt variables
+            input_tokens (int): Prompt size, for the tokens-per-minute budget
+            current_span (Span): llm_call span that receives the route and model used
+            
+        Returns:
+            Chain output: AIMessage, or a structured output dict
+        """
+        models = route.models(self.model)
+        current_span.set(route=route.name)
+        for position, model in enumerate(models):
+            last = position == len(models) - 1
+            chain = self._chain(task, model, route)
+            current_span.set(model=model)
+            try:
+                output = self._limiter(model).call(
+                    lambda: chain.invoke(variables),
+                    tokens=input_tokens + route.max_tokens,
+                    current_span=current_span,
+                    retries=None if last else RETRIES_BEFORE_FALLBACK,
+                    # A timed-out model is not asked again while a fallback is left
+                    timeout_retries=None if last else 0
+                )
+            except Exception as e:
+                if last or not should_fall_back(e):
+                    raise
+                continue
+            self._record_fallback(current_span, models, model)
+            return output
+    
+    async def _asend(self, task, route, variables, input_tokens, current_span):
+        """Async version of _send()."""
+        models = route.models(self.model)
+        current_span.set(route=route.name)
+        for position, model in enumerate(models):
+            last = position == len(models) - 1
+            chain = self._chain(task, model, route)
+            current_span.set(model=model)
+            try:
+                output = await self._limiter(model).acall(
+                    lambda: chain.ainvoke(variables),
+                    tokens=input_tokens + route.max_tokens,
+                    current_span=current_span,
+                    retries=None if last else RETRIES_BEFORE_FALLBACK,
+                    timeout_retries=None if last else 0
+                )
+            except Exception as e:
+                if last or not should_fall_back(e):
+                    raise
+                continue
+            self._record_fallback(current_span, models, model)
+            return output
+    
+    def _stream(self, task, route, variables, input_tokens, current_span):
+        """
+        Stream a response along a route, like _send().
+        
+        Another model is only tried if the failing one has not yielded any chunks.
+        
+        Yields:
+            AIMessageChunk: Successive chunks of the response
+        """
+        models = route.models(self.model)
+        current_span.set(route=route.name)
+        for position, model in enumerate(models):
+            last = position == len(models) - 1
+            chain = self._chain(task, model, route)
+            current_span.set(model=model)
+            started = False
+            try:
+                stream = self._limiter(model).stream(
+                    lambda: chain.stream(variables),
+                    tokens=input_tokens + route.max_tokens,
+                    current_span=current_span,
+                    retries=None if last else RETRIES_BEFORE_FALLBACK,
+                    timeout_retries=None if last else 0
+                )
+                for chunk in stream:
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or last or not should_fall_back(e):
+                    raise
+                continue
+            self._record_fallback(current_span, models, model)
+            return
+    
+    def _record_fallback(self, current_span, models, model):
+        """Note on the span when a model other than the route's primary answered."""
+        if model != models[0]:
+            current_span.set(fallback_from=models[0])
+    
+    def _cache_key(self, prompt, route, model=None):
+        """
+        Build the response cache key for a rendered prompt and a route's settings.
+        
+        Args:
+            prompt (str): Rendered prompt
+            route (Route): Route the request is sent along
+            model (str): Model that answered (defaults to the route's primary)
+            
+        Returns:
+            str: Cache key, or None if caching is disabled
+        """
+        if self.response_cache is None:
+            return None
+        
+        return self.response_cache.make_key(
+            prompt,
+            model=model or route.models(self.model)[0],
+            temperature=self._route_temperature(route),
+            max_tokens=route.max_tokens
+        )
+    
+    def _answer_cache_key(self, cache_key, prompt, route, current_span):
+        """
+        Get the cache key for a received response.
+        
+        Answers from a fallback model are stored under that model, so the
+        primary is asked again next time.
+        
+        Args:
+            cache_key (str): Key of the request for the route's primary model
+            prompt (str): Rendered prompt
+            route (Route): Route the request was sent along
+            current_span (Span): llm_call span holding the model that answered
+            
+        Returns:
+            str: Cache key, or None if caching is disabled
+        """
+        model = current_span.attributes.get("model")
+        if cache_key is None or model == route.models(self.model)[0]:
+            return cache_key
+        return self._cache_key(prompt, route, model)
+    
+    def _cache_lookup(self, cache_key, use_cache):
+        """Return the cached response for cache_key, or None on a miss or bypass."""
+        if cache_key is None or not use_cache:
+            return None
+        return self.response_cache.get(cache_key)
+    
+    def _cache_store(self, cache_key, content):
+        """Store a response under cache_key if caching is enabled."""
+        if cache_key is not None and content:
+            self.response_cache.set(cache_key, content)
+    
+    def _parse_scoring_result(self, result, require_score=False):
         """
         Parse the structured scoring result from the LLM.
         
         Args:
             result (str): Raw result from the scoring chain
+            require_score (bool): Raise instead of defaulting to 3 stars when
+                the result has no SCORE line
             
         Returns:
             dict: Parsed scoring components
+            
+        Raises:
+            ValueError: If require_score is set and no score was found
         """
         # Initialize with defaults
         parsed = {
@@ -252,6 +1200,7 @@ Provide your assessment:
             "recommendations": "Not specified"
         }
         
+        score_found = False
         try:
             lines = result.strip().split('\n')
             current_section = None
@@ -261,12 +1210,12 @@ Provide your assessment:
                 if line.startswith('SCORE:'):
                     score_text = line.replace('SCORE:', '').strip()
                     # Extract number from score text
-                    import re
-                    score_match = re.search(r'(\d+)', score_text)
+                    score_match = SCORE_RE.search(score_text)
                     if score_match:
                         score = int(score_match.group(1))
                         parsed["score"] = max(1, min(5, score))  # Ensure score is between 1-5
                         parsed["stars"] = "⭐" * parsed["score"]
+                        score_found = True
                         
                 elif line.startswith('ANALYSIS:'):
                     current_section = "analysis"
@@ -290,5 +1239,39 @@ Provide your assessment:
                     
         except Exception as e:
             print(f"Error parsing scoring result: {e}")
+        
+        if require_score and not score_found:
+            raise ValueError("Response did not contain a match score")
             
         return parsed
+
+
+def split_paragraphs(cover_letter):
+    """
+    Split a cover letter into its non-empty paragraphs.
+    
+    Args:
+        cover_letter (str): Cover letter text with blank lines between paragraphs
+        
+    Returns:
+        list: Paragraph texts
+    """
+    return [paragraph.strip() for paragraph in PARAGRAPH_SPLIT_RE.split(cover_letter.strip()) if paragraph.strip()]
+
+
+def replace_paragraph(cover_letter, index, new_paragraph):
+    """
+    Replace one paragraph of a cover letter.
+    
+    Args:
+        cover_letter (str): Cover letter text
+        index (int): Index of the paragraph in split_paragraphs(cover_letter)
+        new_paragraph (str): Replacement text
+        
+    Returns:
+        str: Cover letter with paragraphs separated by blank lines
+    """
+    paragraphs = split_paragraphs(cover_letter)
+    paragraphs[index] = new_paragraph.strip()
+    return "\n\n".join(paragraphs)
+
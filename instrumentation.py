@@ -0,0 +1,271 @@
+"""
+Lightweight timing and token instrumentation for the app's pipeline stages.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("covercraft.instrumentation")
+if os.getenv("INSTRUMENTATION_JSON_LOG", "0").lower() in ("1", "true", "yes"):
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# Per-session list that finished spans are appended to, if one is bound
+_current_trace = ContextVar("covercraft_trace", default=None)
+
+
+class MetricsRegistry:
+    """Process-wide, thread-safe aggregates of span timings and token counts."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Clear all aggregates."""
+        with self.lock:
+            self.durations = {}
+            self.tokens = {}
+            self.errors = {}
+            self.routes = {}
+    
+    def observe(self, span):
+        """
+        Add a finished span to the aggregates.
+        
+        Args:
+            span (Span): Finished span
+        """
+        with self.lock:
+            stats = self.durations.setdefault(span.stage, {"count": 0, "sum": 0.0, "buckets": [0] * len(LATENCY_BUCKETS)})
+            stats["count"] += 1
+            stats["sum"] += span.duration
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration <= bound:
+                    stats["buckets"][index] += 1
+            
+            for direction in ("input", "output"):
+                count = span.attributes.get(f"{direction}_tokens")
+                if count:
+                    key = (span.stage, direction)
+                    self.tokens[key] = self.tokens.get(key, 0) + count
+            
+            if span.error:
+                self.errors[span.stage] = self.errors.get(span.stage, 0) + 1
+            
+            # LLM calls are also aggregated per model route and the model that answered
+            route = span.attributes.get("route")
+            if route:
+                stats = self.routes.setdefault((route, span.attributes.get("model", "")), {
+                    "count": 0, "sum": 0.0, "errors": 0, "fallbacks": 0, "input_tokens": 0, "output_tokens": 0
+                })
+                stats["count"] += 1
+                stats["sum"] += span.duration
+                stats["errors"] += 1 if span.error else 0
+                stats["fallbacks"] += 1 if span.attributes.get("fallback_from") else 0
+                stats["input_tokens"] += span.attributes.get("input_tokens") or 0
+                stats["output_tokens"] += span.attributes.get("output_tokens") or 0
+    
+    def snapshot(self):
+        """
+        Get a JSON-serializable copy of the aggregates.
+        
+        Returns:
+            dict: Per-stage count, total and mean seconds, errors and token totals
+        """
+        with self.lock:
+            stages = {}
+            for stage, stats in self.durations.items():
+                stages[stage] = {
+                    "count": stats["count"],
+                    "total_s": round(stats["sum"], 4),
+                    "mean_ms": round(stats["sum"] / stats["count"] * 1000, 2),
+                    "errors": self.errors.get(stage, 0),
+                    "input_tokens": self.tokens.get((stage, "input"), 0),
+                    "output_tokens": self.tokens.get((stage, "output"), 0)
+                }
+            return stages
+    
+    def route_snapshot(self):
+        """
+        Get the per-route aggregates of LLM calls.
+        
+        Returns:
+            list: One dict per (route, model) with calls, mean latency, errors,
+                answers given as a fallback and token totals
+        """
+        with self.lock:
+            return [
+                {
+                    "route": route,
+                    "model": model,
+                    "count": stats["count"],
+                    "mean_ms": round(stats["sum"] / stats["count"] * 1000, 2),
+                    "errors": stats["errors"],
+                    "fallbacks": stats["fallbacks"],
+                    "input_tokens": stats["input_tokens"],
+                    "output_tokens": stats["output_tokens"]
+                }
+                for (route, model), stats in sorted(self.routes.items())
+            ]
+    
+    def prometheus_text(self):
+        """
+        Export the aggregates in the Prometheus text exposition format.
+        
+        Returns:
+            str: Metrics text
+        """
+        lines = [
+            "# HELP covercraft_stage_duration_seconds Duration of pipeline stages.",
+            "# TYPE covercraft_stage_duration_seconds histogram"
+        ]
+        with self.lock:
+            for stage, stats in sorted(self.durations.items()):
+                for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+                    lines.append(f'covercraft_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'covercraft_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats["count"]}')
+                lines.append(f'covercraft_stage_duration_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+                lines.append(f'covercraft_stage_duration_seconds_count{{stage="{stage}"}} {stats["count"]}')
+            
+            lines.append("# HELP covercraft_stage_errors_total Failed pipeline stages.")
+            lines.append("# TYPE covercraft_stage_errors_total counter")
+            for stage, count in sorted(self.errors.items()):
+                lines.append(f'covercraft_stage_errors_total{{stage="{stage}"}} {count}')
+            
+            lines.append("# HELP covercraft_llm_tokens_total LLM tokens by stage and direction.")
+            lines.append("# TYPE covercraft_llm_tokens_total counter")
+            for (stage, direction), count in sorted(self.tokens.items()):
+                lines.append(f'covercraft_llm_tokens_total{{stage="{stage}",direction="{direction}"}} {count}')
+            
+            routes = sorted(self.routes.items())
+            lines.append("# HELP covercraft_route_calls_total LLM calls by model route and the model that answered.")
+            lines.append("# TYPE covercraft_route_calls_total counter")
+            for (route, model), stats in routes:
+                lines.append(f'covercraft_route_calls_total{{route="{route}",model="{model}",outcome="ok"}} {stats["count"] - stats["errors"]}')
+                lines.append(f'covercraft_route_calls_total{{route="{route}",model="{model}",outcome="error"}} {stats["errors"]}')
+            
+            lines.append("# HELP covercraft_route_fallbacks_total LLM calls answered by a fallback model.")
+            lines.append("# TYPE covercraft_route_fallbacks_total counter")
+            for (route, model), stats in routes:
+                lines.append(f'covercraft_route_fallbacks_total{{route="{route}",model="{model}"}} {stats["fallbacks"]}')
+            
+            lines.append("# HELP covercraft_route_duration_seconds_total Time spent in LLM calls by route and model.")
+            lines.append("# TYPE covercraft_route_duration_seconds_total counter")
+            for (route, model), stats in routes:
+                lines.append(f'covercraft_route_duration_seconds_total{{route="{route}",model="{model}"}} {stats["sum"]:.6f}')
+            
+            lines.append("# HELP covercraft_route_tokens_total LLM tokens by route, model and direction.")
+            lines.append("# TYPE covercraft_route_tokens_total counter")
+            for (route, model), stats in routes:
+                lines.append(f'covercraft_route_tokens_total{{route="{route}",model="{model}",direction="input"}} {stats["input_tokens"]}')
+                lines.append(f'covercraft_route_tokens_total{{route="{route}",model="{model}",direction="output"}} {stats["output_tokens"]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class Span:
+    """A timed pipeline stage with attributes such as token counts."""
+    
+    def __init__(self, stage, attributes):
+        self.stage = stage
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = 0.0
+        self.error = None
+    
+    def set(self, **attributes):
+        """Attach attributes to the span."""
+        self.attributes.update(attributes)
+    
+    def record_usage(self, message):
+        """
+        Capture token usage from an LLM response message.
+        
+        Args:
+            message: LangChain AIMessage (or chunk) carrying usage metadata
+        """
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+            return
+        
+        # Older responses only carry the raw OpenAI usage block
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+        if token_usage:
+            self.set(input_tokens=token_usage.get("prompt_tokens", 0), output_tokens=token_usage.get("completion_tokens", 0))
+    
+    def to_dict(self):
+        """
+        Convert to a JSON-serializable record.
+        
+        Returns:
+            dict: Stage, start timestamp, duration in milliseconds, error and attributes
+        """
+        record = {
+            "stage": self.stage,
+            "start": round(self.start, 3),
+            "duration_ms": round(self.duration * 1000, 2),
+            "error": self.error
+        }
+        record.update(self.attributes)
+        return record
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time a pipeline stage.
+    
+    The finished span is added to the process-wide registry, appended to the
+    bound session trace (if any) and logged as one JSON line.
+    
+    Args:
+        stage (str): Stage name, e.g. "pdf_parse" or "llm_call"
+        **attributes: Extra attributes to record (task, model, ...)
+    
+    Yields:
+        Span: The running span, for attaching token usage or attributes
+    """
+    current = Span(stage, attributes)
+    started = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # A consumer stopped reading a streamed stage early; not a failure
+        raise
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        registry.observe(current)
+        
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append(current.to_dict())
+        
+        logger.info(json.dumps(current.to_dict(), default=str))
+
+
+def bind_trace(trace):
+    """
+    Collect spans finished in the current context into a list-like trace.
+    
+    Args:
+        trace: List or bounded deque that receives span records
+    """
+    _current_trace.set(trace)
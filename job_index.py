@@ -0,0 +1,237 @@
+"""
+Local near-duplicate index of job descriptions with their earlier analyses.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from sqlite_store import SQLiteStore
+
+
+# Index configuration (overridable through environment variables)
+JOB_INDEX_ENABLED = os.getenv("JOB_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", os.path.join(".cache", "job_index.sqlite3"))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# MinHash signature length and LSH banding (32 bands of 4 rows: candidates from ~45% similarity)
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+SHINGLE_WORDS = 3
+
+# Universal hashing modulo a Mersenne prime; 31-bit operands keep products within uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240229)
+_HASH_A = _rng.integers(1, (1 << 31) - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, (1 << 31) - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+WORD_RE = re.compile(r"\w+")
+
+PREVIEW_CHARS = 160
+
+
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    """
+    Hash the overlapping word n-grams of a text.
+    
+    Args:
+        text (str): Input text
+        size (int): Words per shingle
+    
+    Returns:
+        numpy.ndarray: Distinct 31-bit shingle hashes
+    """
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    hashes = {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=4).digest(), "little") & 0x7FFFFFFF
+        for i in range(len(words) - size + 1)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash_signature(text):
+    """
+    Compute the MinHash signature of a text.
+    
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' shingle sets.
+    
+    Args:
+        text (str): Input text
+    
+    Returns:
+        numpy.ndarray: MINHASH_PERMUTATIONS uint64 values
+    """
+    shingles = shingle_hashes(text)
+    permuted = (_HASH_A[:, None] * shingles[None, :] + _HASH_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+def signature_similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(first == second))
+
+
+def _band_keys(signature):
+    """LSH bucket keys, one per band of the signature."""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+
+def text_hash(text):
+    """Hex SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JobIndex(SQLiteStore):
+    """SQLite-backed MinHash LSH index of job descriptions and their analyses per CV."""
+    
+    def __init__(self, path=JOB_INDEX_PATH, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Initialize the index, creating the database if needed.
+        
+        Args:
+            path (str): Path to the SQLite database file
+            threshold (float): Minimum estimated similarity for a near duplicate
+        """
+        super().__init__(path)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._buckets = {}
+        self._loaded_id = 0
+        
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text_hash TEXT NOT NULL,
+                cv_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                preview TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (text_hash, cv_hash)
+            )
+        """)
+    
+    def _refresh(self):
+        """Load signatures added since the last refresh, including by other processes."""
+        rows = self._connect().execute(
+            "SELECT id, cv_hash, signature FROM jobs WHERE id > ? ORDER BY id", (self._loaded_id,)
+        ).fetchall()
+        with self._lock:
+            for entry_id, cv_hash, blob in rows:
+                if entry_id <= self._loaded_id:
+                    continue
+                signature = np.frombuffer(blob, dtype=np.uint64)
+                self._signatures[entry_id] = signature
+                for key in _band_keys(signature):
+                    self._buckets.setdefault((cv_hash,) + key, set()).add(entry_id)
+                self._loaded_id = entry_id
+    
+    def find(self, job_description, cv_hash):
+        """
+        Find the most similar earlier job description analyzed for the same CV.
+        
+        Args:
+            job_description (str): Job description text
+            cv_hash (str): text_hash() of the CV text
+        
+        Returns:
+            dict: "similarity", "preview", "analysis" and "updated_at" of the best
+                match at or above the threshold, or None
+        """
+        self._refresh()
+        signature = minhash_signature(job_description)
+        
+        with self._lock:
+            candidates = set()
+            for key in _band_keys(signature):
+                candidates |= self._buckets.get((cv_hash,) + key, set())
+            scored = [(signature_similarity(signature, self._signatures[entry_id]), entry_id) for entry_id in candidates]
+        
+        if not scored:
+            return None
+        similarity, entry_id = max(scored)
+        if similarity < self.threshold:
+            return None
+        
+        row = self._connect().execute(
+            "SELECT preview, analysis, updated_at FROM jobs WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        preview, analysis, updated_at = row
+        return {
+            "similarity": similarity,
+            "preview": preview,
+            "analysis": json.loads(analysis),
+            "updated_at": updated_at
+        }
+    
+    def add(self, job_description, cv_hash, **analysis):
+        """
+        Record analysis results for a job description and CV.
+        
+        Results are merged into an existing entry for the same texts.
+        
+        Args:
+            job_description (str): Job description text
+            cv_hash (str): text_hash() of the CV text
+            **analysis: JSON-serializable results, e.g. cv_score=... or cover_letter=...
+        """
+        key = text_hash(job_description)
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT analysis FROM jobs WHERE text_hash = ? AND cv_hash = ?", (key, cv_hash)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (text_hash, cv_hash, signature, preview, analysis, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        cv_hash,
+                        minhash_signature(job_description).tobytes(),
+                        " ".join(job_description.split())[:PREVIEW_CHARS],
+                        json.dumps(analysis, ensure_ascii=False),
+                        now
+                    )
+                )
+            else:
+                merged = json.loads(row[0])
+                merged.update(analysis)
+                conn.execute(
+                    "UPDATE jobs SET analysis = ?, updated_at = ? WHERE text_hash = ? AND cv_hash = ?",
+                    (json.dumps(merged, ensure_ascii=False), now, key, cv_hash)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def get_job_index():
+    """
+    Get the process-wide job index configured from the environment.
+    
+    Returns:
+        JobIndex: Shared index, or None if disabled
+    """
+    if not JOB_INDEX_ENABLED:
+        return None
+    return JobIndex()
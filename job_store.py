@@ -0,0 +1,457 @@
+"""
+Streaming ingestion of job-board exports into a local job store.
+
+Usage:
+    python job_store.py ingest EXPORT [EXPORT ...] [--store PATH]
+    python job_store.py stats [--store PATH]
+
+EXPORT is a JSONL or CSV file (optionally gzip-compressed), a saved HTML page,
+or a directory of saved pages. Records are read, cleaned and written in
+batches, so memory use does not grow with the size of the export.
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from config import JOB_STORE_PATH, MIN_INPUT_CHARS
+from sqlite_store import SQLiteStore
+
+
+# Rows per insert transaction and per read batch
+INGEST_BATCH_SIZE = 500
+
+# Keys checked, in order, for the job fields in JSONL records and CSV rows
+TEXT_FIELDS = ("job_description", "description", "text", "content", "body")
+TITLE_FIELDS = ("title", "job_title", "position", "name")
+ID_FIELDS = ("id", "job_id", "url", "link")
+
+HTML_EXTENSIONS = (".html", ".htm")
+
+# Elements whose content is page chrome rather than the posting
+SKIPPED_TAGS = frozenset(("script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "button"))
+
+# Elements that start a new line of text
+BLOCK_TAGS = frozenset((
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table",
+    "section", "article", "main", "blockquote", "pre", "dd", "dt", "hr"
+))
+
+TAG_RE = re.compile(r"<[a-zA-Z/!][^>]*>")
+INLINE_SPACE_RE = re.compile(r"[^\S\n]+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document, one block per line."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.title = ""
+        self._skip_depth = 0
+        self._in_title = False
+        self._in_heading = False
+        self._heading = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "h1" and not self._heading:
+            self._in_heading = True
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "h1":
+            self._in_heading = False
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            if self._in_heading:
+                self._heading.append(data)
+            self.parts.append(data)
+    
+    def heading(self):
+        """The first <h1>, falling back to the <title>."""
+        return " ".join("".join(self._heading).split()) or " ".join(self.title.split())
+
+
+def html_to_text(markup):
+    """
+    Extract the visible text of an HTML document or fragment.
+    
+    Args:
+        markup (str): HTML
+    
+    Returns:
+        str: Text with one line per block element
+    """
+    parser = _TextExtractor()
+    parser.feed(markup)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def clean_description(text):
+    """
+    Turn a raw job description into plain, compact text.
+    
+    Markup is stripped, boilerplate and repeated segments are dropped, and
+    whitespace is collapsed within lines, keeping one line per paragraph.
+    
+    Args:
+        text (str): Raw description, plain text or HTML
+    
+    Returns:
+        str: Cleaned description
+    """
+    # Deferred so the app can use the store without loading tiktoken
+    from token_budget import compact_text
+    
+    if TAG_RE.search(text):
+        text = html_to_text(text)
+    else:
+        text = html.unescape(text)
+    
+    seen = set()
+    kept = []
+    for line in text.splitlines():
+        line = compact_text(INLINE_SPACE_RE.sub(" ", line).strip())
+        fingerprint = " ".join(line.lower().split())
+        if fingerprint and fingerprint not in seen:
+            seen.add(fingerprint)
+            kept.append(line)
+    return "\n".join(kept)
+
+
+def description_hash(text):
+    """Hex SHA-256 digest of a description, ignoring case and whitespace."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def _open_text(path):
+    """Open a text file for streaming, decompressing .gz files."""
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, encoding="utf-8", errors="replace", newline="")
+
+
+def _first_field(record, fields):
+    """The first non-empty value among the given keys, as a string."""
+    return next((str(record[field]) for field in fields if record.get(field)), "")
+
+
+def read_jsonl(path):
+    """
+    Stream raw records from a JSONL export, skipping lines that are not JSON objects.
+    
+    Args:
+        path (str): JSONL file, optionally .gz
+    
+    Yields:
+        dict: Record with "job_id", "title" and "description" keys
+    """
+    with _open_text(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            yield {
+                "job_id": _first_field(record, ID_FIELDS) or str(line_number),
+                "title": _first_field(record, TITLE_FIELDS),
+                "description": _first_field(record, TEXT_FIELDS)
+            }
+
+
+def read_csv(path):
+    """
+    Stream raw records from a CSV export with a header row.
+    
+    Args:
+        path (str): CSV file, optionally .gz
+    
+    Yields:
+        dict: Record with "job_id", "title" and "description" keys
+    """
+    # Exported descriptions routinely exceed the default 128 KB field limit
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    
+    with _open_text(path) as f:
+        reader = csv.DictReader(f)
+        for row_number, row in enumerate(reader, start=1):
+            record = {(key or "").strip().lower(): value for key, value in row.items()}
+            yield {
+                "job_id": _first_field(record, ID_FIELDS) or str(row_number),
+                "title": _first_field(record, TITLE_FIELDS),
+                "description": _first_field(record, TEXT_FIELDS)
+            }
+
+
+def read_html(path):
+    """
+    Read a saved job posting page, or every page in a directory.
+    
+    Args:
+        path (str): .html/.htm file or directory of them
+    
+    Yields:
+        dict: Record with "job_id", "title" and "description" keys
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(HTML_EXTENSIONS):
+                yield from read_html(os.path.join(path, name))
+        return
+    
+    parser = _TextExtractor()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+    
+    yield {
+        "job_id": os.path.basename(path),
+        "title": parser.heading() or os.path.splitext(os.path.basename(path))[0],
+        "description": "".join(parser.parts)
+    }
+
+
+def read_export(path):
+    """
+    Stream raw records from an export, picking the reader by file type.
+    
+    Args:
+        path (str): JSONL, CSV or HTML file, or directory of HTML pages
+    
+    Yields:
+        dict: Record with "job_id", "title" and "description" keys
+    """
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    
+    if os.path.isdir(path) or name.endswith(HTML_EXTENSIONS):
+        return read_html(path)
+    if name.endswith(".csv"):
+        return read_csv(path)
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return read_jsonl(path)
+    raise ValueError(f"Unsupported export format: {path}")
+
+
+class JobStore(SQLiteStore):
+    """SQLite-backed store of cleaned, deduplicated job postings."""
+    
+    def __init__(self, path=JOB_STORE_PATH):
+        """
+        Initialize the store, creating the database if needed.
+        
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        super().__init__(path)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                text_hash TEXT NOT NULL UNIQUE,
+                source TEXT NOT NULL,
+                added_at REAL NOT NULL
+            )
+        """)
+    
+    def add_many(self, postings, source=""):
+        """
+        Insert postings in one transaction, skipping ones already stored.
+        
+        Args:
+            postings (list): Dicts with "job_id", "title" and "description" keys
+            source (str): Export the postings came from
+        
+        Returns:
+            int: Number of postings inserted
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO postings (job_id, title, description, text_hash, source, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (posting["job_id"], posting["title"], posting["description"], description_hash(posting["description"]), source, now)
+                    for posting in postings
+                )
+            )
+            inserted = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+    
+    def ingest(self, path, batch_size=INGEST_BATCH_SIZE):
+        """
+        Clean, filter and store every posting of an export.
+        
+        Postings shorter than CoverLetterAgent.validate_inputs accepts are
+        rejected, and postings whose cleaned text is already stored (from this
+        or an earlier export) are skipped.
+        
+        Args:
+            path (str): Export file or directory (see read_export)
+            batch_size (int): Postings per insert transaction
+        
+        Returns:
+            dict: "read", "added", "duplicates" and "too_short" counts
+        """
+        counts = {"read": 0, "added": 0, "duplicates": 0, "too_short": 0}
+        source = os.path.basename(os.path.normpath(path))
+        batch = []
+        
+        def flush():
+            added = self.add_many(batch, source=source)
+            counts["added"] += added
+            counts["duplicates"] += len(batch) - added
+            batch.clear()
+        
+        for record in read_export(path):
+            counts["read"] += 1
+            description = clean_description(record["description"])
+            if len(description) < MIN_INPUT_CHARS:
+                counts["too_short"] += 1
+                continue
+            batch.append({
+                "job_id": record["job_id"],
+                "title": " ".join(clean_description(record["title"]).split()),
+                "description": description
+            })
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        
+        return counts
+    
+    def iter_postings(self, batch_size=INGEST_BATCH_SIZE, after_id=0):
+        """
+        Stream stored postings in insertion order, one batch in memory at a time.
+        
+        Args:
+            batch_size (int): Rows fetched per query
+            after_id (int): Only postings with a larger id, to resume a run
+        
+        Yields:
+            dict: Posting with "id", "job_id", "title" and "description" keys
+        """
+        conn = self._connect()
+        while True:
+            rows = conn.execute(
+                "SELECT id, job_id, title, description FROM postings WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for posting_id, job_id, title, description in rows:
+                yield {"id": posting_id, "job_id": job_id, "title": title, "description": description}
+            after_id = rows[-1][0]
+    
+    def search(self, query="", limit=20):
+        """
+        Find postings whose title or description contains a phrase.
+        
+        Args:
+            query (str): Phrase to look for (most recent postings if empty)
+            limit (int): Maximum number of results
+        
+        Returns:
+            list: Postings with "id", "job_id", "title" and "description" keys, newest first
+        """
+        pattern = f"%{query.strip()}%"
+        rows = self._connect().execute(
+            "SELECT id, job_id, title, description FROM postings WHERE title LIKE ? OR description LIKE ? ORDER BY id DESC LIMIT ?",
+            (pattern, pattern, limit)
+        ).fetchall()
+        return [{"id": posting_id, "job_id": job_id, "title": title, "description": description} for posting_id, job_id, title, description in rows]
+    
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def _shared_store(path):
+    return JobStore(path)
+
+
+def get_job_store():
+    """
+    Get the process-wide job store configured from the environment.
+    
+    Returns:
+        JobStore: Shared store, or None if nothing has been ingested yet
+    """
+    if not os.path.isfile(JOB_STORE_PATH):
+        return None
+    return _shared_store(JOB_STORE_PATH)
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Ingest job-board exports into the local job store.")
+    parser.add_argument("--store", default=JOB_STORE_PATH, help="Path to the job store database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="Add the postings of one or more exports")
+    ingest_parser.add_argument("exports", nargs="+", help="JSONL/CSV files (optionally .gz), HTML pages or directories of pages")
+    ingest_parser.add_argument("-b", "--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Postings per insert transaction")
+    commands.add_parser("stats", help="Show the number of stored postings")
+    args = parser.parse_args(argv)
+    
+    store = JobStore(args.store)
+    
+    if args.command == "ingest":
+        for path in args.exports:
+            counts = store.ingest(path, batch_size=args.batch_size)
+            print(
+                f"{path}: {counts['added']} added, {counts['duplicates']} duplicates, "
+                f"{counts['too_short']} too short ({counts['read']} read)"
+            )
+    
+    print(f"{len(store)} postings in {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Background execution of AI tasks so the Streamlit script thread never blocks.
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+
+# Worker threads shared by all sessions; jobs mostly wait on the network
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "32"))
+
+# Worker threads one session may occupy at once; its other jobs wait their turn.
+# Matches app.MAX_VARIANTS so a full comparison of letter variants runs at once
+SESSION_JOB_WORKERS = int(os.getenv("SESSION_JOB_WORKERS", "8"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when cancellation was requested."""
+
+
+class Job:
+    """A unit of background work with status, result and cancellation."""
+    
+    def __init__(self, kind, label, func, args, kwargs, meta=None):
+        """
+        Args:
+            kind (str): Job type, e.g. "score" or "generate"
+            label (str): Human-readable description
+            func (callable): Called as func(job, *args, **kwargs) in a worker thread
+            args (tuple): Positional arguments for func
+            kwargs (dict): Keyword arguments for func
+            meta (dict): Extra data for whoever picks up the result
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.meta = meta or {}
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+    
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+    
+    @property
+    def elapsed(self):
+        """Seconds since the job started running (or was submitted, while pending)."""
+        start = self.started_at or self.created_at
+        return (self.finished_at or time.time()) - start
+    
+    def cancel(self):
+        """
+        Request cancellation.
+        
+        A pending job never starts. A running job stops at its next
+        check_cancelled() call, and its result is discarded if it finishes anyway.
+        """
+        self.cancel_event.set()
+        if self.future is None and self.status == PENDING:
+            # Still queued behind its session's other jobs
+            self.status = CANCELLED
+            self.finished_at = time.time()
+        elif self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+            self.finished_at = time.time()
+    
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested; call between steps."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+    
+    def run(self):
+        """Execute the job function and record the outcome."""
+        if self.cancel_event.is_set():
+            self.status = CANCELLED
+            self.finished_at = time.time()
+            return
+        
+        self.status = RUNNING
+        self.started_at = time.time()
+        try:
+            result = self.func(self, *self.args, **self.kwargs)
+            if self.cancel_event.is_set():
+                self.status = CANCELLED
+            else:
+                self.result = result
+                self.status = DONE
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = str(e)
+            self.status = FAILED
+        finally:
+            self.finished_at = time.time()
+
+
+class JobExecutor:
+    """Thread pool that runs Jobs, with a share of the workers per session."""
+    
+    def __init__(self, max_workers=JOB_WORKERS, session_workers=SESSION_JOB_WORKERS):
+        """
+        Args:
+            max_workers (int): Worker threads for the whole process
+            session_workers (int): Worker threads one session may occupy at once
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="covercraft-job")
+        self.session_workers = max(1, session_workers)
+        # Reentrant: a job that is already done calls _release from _dispatch
+        self.lock = threading.RLock()
+        self.running = defaultdict(int)
+        self.waiting = defaultdict(deque)
+    
+    def submit(self, kind, label, func, *args, meta=None, session=None, **kwargs):
+        """
+        Start a job in the background.
+        
+        A session's jobs beyond session_workers wait in its own queue, so one
+        session cannot take over the pool. The caller's context (e.g. the
+        bound instrumentation trace) is carried into the worker thread.
+        
+        Args:
+            kind (str): Job type
+            label (str): Human-readable description
+            func (callable): Called as func(job, *args, **kwargs)
+            *args: Positional arguments for func
+            meta (dict): Extra data for whoever picks up the result
+            session (str): Id of the submitting session (None for no limit)
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            Job: The submitted job
+        """
+        job = Job(kind, label, func, args, kwargs, meta=meta)
+        context = contextvars.copy_context()
+        if session is None:
+            job.future = self.pool.submit(context.run, job.run)
+            return job
+        
+        with self.lock:
+            self.waiting[session].append((job, context))
+            self._dispatch(session)
+        return job
+    
+    def _dispatch(self, session):
+        """Start the session's queued jobs while it has free workers; call with the lock held."""
+        queue = self.waiting.get(session)
+        while queue and self.running[session] < self.session_workers:
+            job, context = queue.popleft()
+            if job.finished:
+                continue
+            self.running[session] += 1
+            job.future = self.pool.submit(context.run, job.run)
+            # Also called when the job is cancelled before it starts
+            job.future.add_done_callback(functools.partial(self._release, session))
+        
+        if not self.waiting.get(session):
+            self.waiting.pop(session, None)
+        if not self.running.get(session):
+            self.running.pop(session, None)
+    
+    def _release(self, session, future):
+        """Hand a finished job's worker to the session's next queued job."""
+        with self.lock:
+            self.running[session] -= 1
+            self._dispatch(session)
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_executor():
+    """
+    Get the process-wide job executor.
+    
+    Returns:
+        JobExecutor: Shared executor
+    """
+    return JobExecutor()
+
+
+def run_scoring(job, agent, cv_content, job_description, use_cache=True, use_digest=False):
+    """
+    Job function: structured CV match scoring.
+    
+    The inputs are prepared here (see CoverLetterAgent.prepare_inputs), since
+    summarizing the CV is an LLM call of its own.
+    
+    Returns:
+        CVMatchScore: Scoring result
+    """
+    cv_content, job_description, _ = agent.prepare_inputs(cv_content, job_description, use_digest=use_digest, raise_errors=True)
+    job.check_cancelled()
+    return agent.score_cv_match_structured(cv_content, job_description, use_cache=use_cache, raise_errors=True)
+
+
+def run_generation(job, agent, cv_content, job_description, tone, use_cache=True, use_digest=False):
+    """
+    Job function: cover letter generation.
+    
+    The letter is streamed so job.progress holds the text received so far
+    and cancellation takes effect between chunks.
+    
+    Returns:
+        str: Generated cover letter
+    """
+    cv_content, job_description, _ = agent.prepare_inputs(cv_content, job_description, use_digest=use_digest, raise_errors=True)
+    job.check_cancelled()
+    
+    chunks = []
+    stream = agent.stream_cover_letter(cv_content, job_description, tone=tone, use_cache=use_cache, raise_errors=True)
+    try:
+        for chunk in stream:
+            job.check_cancelled()
+            chunks.append(chunk)
+            job.progress = "".join(chunks)
+    finally:
+        # Closing the generator also closes the HTTP stream on cancellation
+        stream.close()
+    return "".join(chunks)
+
+
+def run_score_and_generate(job, agent, cv_content, job_description, tone, use_cache=True, use_digest=False):
+    """
+    Job function: match analysis and cover letter from a single request.
+    
+    Returns:
+        tuple: (scoring_result, cover_letter) as returned by score_and_generate()
+    """
+    cv_content, job_description, _ = agent.prepare_inputs(cv_content, job_description, use_digest=use_digest, raise_errors=True)
+    job.check_cancelled()
+    return agent.score_and_generate(cv_content, job_description, tone=tone, use_cache=use_cache, raise_errors=True)
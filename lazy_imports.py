@@ -0,0 +1,86 @@
+"""
+Deferred imports of heavy subsystems for a fast cold start.
+"""
+
+import importlib
+import os
+import threading
+
+
+# Import heavy modules on first use instead of at app start-up
+LAZY_IMPORTS = os.getenv("LAZY_IMPORTS", "1").lower() in ("1", "true", "yes")
+
+# Import them in a background thread once the first page has been sent
+PREWARM_IMPORTS = os.getenv("PREWARM_IMPORTS", "1").lower() in ("1", "true", "yes")
+
+_prewarm_lock = threading.Lock()
+_prewarm_thread = None
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def _load(self):
+        if self._module is None:
+            # The import system's per-module locks make concurrent first use safe
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+    
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name):
+    """
+    Get a module, deferring the import when LAZY_IMPORTS is enabled.
+    
+    Args:
+        name (str): Module name
+    
+    Returns:
+        Module or LazyModule that imports the module on first attribute access
+    """
+    if not LAZY_IMPORTS:
+        return importlib.import_module(name)
+    return LazyModule(name)
+
+
+def prewarm(names):
+    """
+    Import modules in a background thread, once per process.
+    
+    Import errors are ignored here; they surface on first real use.
+    
+    Args:
+        names (list): Module names, in import order
+    
+    Returns:
+        threading.Thread: The prewarm thread, or None if disabled or already started
+    """
+    global _prewarm_thread
+    
+    if not PREWARM_IMPORTS:
+        return None
+    
+    with _prewarm_lock:
+        if _prewarm_thread is not None:
+            return None
+        
+        def run():
+            for name in names:
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    pass
+        
+        _prewarm_thread = threading.Thread(target=run, name="import-prewarm", daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
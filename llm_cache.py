@@ -0,0 +1,134 @@
+"""
+Persistent SQLite-backed cache for LLM responses.
+"""
+
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+
+from sqlite_store import SQLiteStore
+
+
+# Cache configuration (overridable through environment variables)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+class LLMResponseCache(SQLiteStore):
+    """On-disk response cache with TTL expiry and LRU eviction."""
+    
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_entries=LLM_CACHE_MAX_ENTRIES):
+        """
+        Initialize the response cache, creating the database if needed.
+        
+        Args:
+            path (str): Path to the SQLite database file
+            ttl_seconds (float): Entry lifetime in seconds (0 disables expiry)
+            max_entries (int): Maximum number of entries before LRU eviction
+        """
+        super().__init__(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed)")
+    
+    @staticmethod
+    def make_key(prompt, **params):
+        """
+        Build a cache key from a rendered prompt and model parameters.
+        
+        Args:
+            prompt (str): Fully rendered prompt text
+            **params: Model parameters that affect the output (model, temperature, ...)
+        
+        Returns:
+            str: Hex SHA-256 digest identifying the request
+        """
+        payload = json.dumps({"prompt": prompt, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key):
+        """
+        Look up a cached response, refreshing its LRU position on a hit.
+        
+        Args:
+            key (str): Key from make_key()
+        
+        Returns:
+            str: Cached response, or None if missing or expired
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        
+        value, created_at = row
+        now = time.time()
+        if self.ttl_seconds and now - created_at > self.ttl_seconds:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        
+        conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+        return value
+    
+    def set(self, key, value):
+        """
+        Store a response and evict expired and least recently used entries.
+        
+        Args:
+            key (str): Key from make_key()
+            value (str): Response text to cache
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            if self.max_entries:
+                conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def clear(self):
+        """Remove all cached responses."""
+        self._connect().execute("DELETE FROM responses")
+    
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """
+    Get the process-wide response cache configured from the environment.
+    
+    Returns:
+        LLMResponseCache: Shared cache, or None if caching is disabled
+    """
+    if not LLM_CACHE_ENABLED:
+        return None
+    return LLMResponseCache()
@@ -0,0 +1,176 @@
+"""
+Task-aware selection of models and request parameters.
+"""
+
+import json
+import os
+
+import openai
+
+from rate_limiter import is_transient
+
+
+# Models for the short analysis tasks and for letter writing (empty uses the agent's model)
+SCORING_MODEL = os.getenv("SCORING_MODEL", "")
+LETTER_MODEL = os.getenv("LETTER_MODEL", "")
+
+# Model tried when a route's own models fail or time out (unset: no fallback)
+FALLBACK_MODEL = os.getenv("FALLBACK_MODEL", "")
+
+# Full route table overrides as JSON, e.g.
+# {"cover_letter": [{"model": "gpt-4o", "fallbacks": ["gpt-4o-mini"], "timeout": 60}]}
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+
+# Retries of a model before moving on to the route's next one; the last model
+# gets the rate limiter's full retries
+RETRIES_BEFORE_FALLBACK = int(os.getenv("RETRIES_BEFORE_FALLBACK", "1"))
+
+# Tasks that SCORING_MODEL and LETTER_MODEL apply to
+SCORING_TASKS = ("scoring", "structured_scoring", "cv_digest")
+LETTER_TASKS = ("cover_letter", "score_and_generate", "paragraph")
+
+ROUTE_FIELDS = ("model", "max_tokens", "temperature", "fallbacks", "timeout", "max_input_tokens")
+
+
+def should_fall_back(error):
+    """
+    Tell whether another model may succeed where this one failed.
+    
+    Args:
+        error (Exception): Error raised by the model's request
+    
+    Returns:
+        bool: True for transient failures and unavailable models
+    """
+    if isinstance(error, openai.NotFoundError):
+        return True
+    return is_transient(error)
+
+
+class Route:
+    """Model and request parameters for one task and input size."""
+    
+    def __init__(self, task, model=None, max_tokens=None, temperature=None, fallbacks=(), timeout=None, max_input_tokens=None):
+        """
+        Args:
+            task (str): Task name, e.g. "structured_scoring" or "cover_letter"
+            model (str): Primary model (None for the agent's model)
+            max_tokens (int): Output token limit
+            temperature (float): Sampling temperature (None for the agent's)
+            fallbacks (list): Models tried in order if the primary fails
+            timeout (float): Request timeout in seconds (None for the HTTP client's)
+            max_input_tokens (int): Largest prompt this route takes (None for any size)
+        """
+        self.task = task
+        self.model = model or None
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.fallbacks = [name for name in fallbacks if name]
+        self.timeout = timeout
+        self.max_input_tokens = max_input_tokens
+    
+    @property
+    def name(self):
+        """Label used in metrics, e.g. "cover_letter" or "structured_scoring<=3000"."""
+        if self.max_input_tokens is None:
+            return self.task
+        return f"{self.task}<={self.max_input_tokens}"
+    
+    def models(self, default_model):
+        """
+        Models to try, in order, without duplicates.
+        
+        Args:
+            default_model (str): Model used when the route names none
+        
+        Returns:
+            list: Primary model followed by the fallbacks
+        """
+        models = []
+        for name in [self.model or default_model] + self.fallbacks:
+            if name not in models:
+                models.append(name)
+        return models
+    
+    def to_dict(self):
+        return {field: getattr(self, field) for field in ROUTE_FIELDS}
+
+
+class ModelRouter:
+    """Picks the route of a request from its task and prompt size."""
+    
+    def __init__(self, routes):
+        """
+        Args:
+            routes (dict): Task name -> list of Routes; each task's routes are
+                ordered by max_input_tokens, and the last takes any size
+        """
+        self.routes = routes
+    
+    @classmethod
+    def from_env(cls, defaults):
+        """
+        Build a router from default rules and the environment.
+        
+        SCORING_MODEL and LETTER_MODEL fill in routes that name no model,
+        FALLBACK_MODEL (if set) is added to routes without fallbacks, and MODEL_ROUTES
+        replaces the rules of the tasks it lists (unset fields are taken from
+        the task's first default rule).
+        
+        Args:
+            defaults (dict): Task name -> list of rule dicts with Route fields
+        
+        Returns:
+            ModelRouter: Configured router
+        """
+        rules = {task: [dict(rule) for rule in task_rules] for task, task_rules in defaults.items()}
+        
+        for task, task_rules in rules.items():
+            group_model = SCORING_MODEL if task in SCORING_TASKS else LETTER_MODEL if task in LETTER_TASKS else ""
+            for rule in task_rules:
+                if group_model and not rule.get("model"):
+                    rule["model"] = group_model
+                if FALLBACK_MODEL and not rule.get("fallbacks"):
+                    rule["fallbacks"] = [FALLBACK_MODEL]
+        
+        if MODEL_ROUTES:
+            for task, task_rules in json.loads(MODEL_ROUTES).items():
+                base = (rules.get(task) or [{}])[0]
+                rules[task] = [{**base, "max_input_tokens": None, **rule} for rule in task_rules]
+        
+        return cls({
+            task: sorted(
+                (Route(task, **{field: rule[field] for field in ROUTE_FIELDS if field in rule}) for rule in task_rules),
+                key=lambda route: float("inf") if route.max_input_tokens is None else route.max_input_tokens
+            )
+            for task, task_rules in rules.items()
+        })
+    
+    def select(self, task, input_tokens=0):
+        """
+        Get the route for a request.
+        
+        Args:
+            task (str): Task name
+            input_tokens (int): Prompt size in tokens
+        
+        Returns:
+            Route: First route of the task whose max_input_tokens fits the prompt
+                (the task's last route if none does)
+        """
+        routes = self.routes.get(task)
+        if not routes:
+            return Route(task)
+        for route in routes:
+            if route.max_input_tokens is None or input_tokens <= route.max_input_tokens:
+                return route
+        return routes[-1]
+    
+    def to_dict(self):
+        """
+        Describe the route table.
+        
+        Returns:
+            dict: Task name -> list of route settings
+        """
+        return {task: [route.to_dict() for route in routes] for task, routes in self.routes.items()}
@@ -2,92 +2,58 @@
 PDF generation utilities for creating downloadable cover letters.
 """
 
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.colors import black
-from io import BytesIO
+import hashlib
+import os
 import re
+import zipfile
+import streamlit as st
+from instrumentation import span
+from pdf_render import PAGE_SIZES, create_cover_letter_pdf, get_styles, render_letter_job
+from process_pool import get_process_pool
 
 
-def create_cover_letter_pdf(cover_letter_text, applicant_name="[Your Name]"):
+# Maximum number of rendered PDFs kept in memory
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "64"))
+
+# Bulk exports with at least this many letters are rendered in worker processes.
+# A letter takes about 9 ms to render, and the pool adds about 10 ms plus 1.5 ms per
+# letter once warm, but starting it costs over a second, more than rendering the
+# largest letter history serially; so exports are serial unless workers are set.
+EXPORT_PARALLEL_THRESHOLD = 16
+EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "1"))
+
+
+def cover_letter_hash(cover_letter_text):
     """
-    Create a PDF from the cover letter text.
+    Compute a digest identifying a cover letter's text.
     
     Args:
         cover_letter_text (str): The cover letter content
-        applicant_name (str): Name of the applicant
         
     Returns:
-        bytes: PDF file as bytes
+        str: Hex SHA-256 digest of the text
     """
-    # Create a BytesIO buffer to store the PDF
-    buffer = BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=72,
-        leftMargin=72,
-        topMargin=72,
-        bottomMargin=18
-    )
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        textColor=black,
-        alignment=1  # Center alignment
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['Normal'],
-        fontSize=12,
-        spaceAfter=12,
-        leading=14,
-        textColor=black,
-        alignment=0  # Left alignment
-    )
-    
-    # Build the PDF content
-    story = []
-    
-    # Add title
-    story.append(Paragraph("Cover Letter", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Clean and format the cover letter text
-    # Split by double newlines to preserve paragraph structure
-    paragraphs = re.split(r'\n\s*\n', cover_letter_text.strip())
-    
-    for paragraph in paragraphs:
-        if paragraph.strip():
-            # Clean up the paragraph text
-            clean_paragraph = paragraph.strip().replace('\n', ' ')
-            # Remove excessive whitespace
-            clean_paragraph = re.sub(r'\s+', ' ', clean_paragraph)
-            
-            # Add the paragraph to the story
-            story.append(Paragraph(clean_paragraph, body_style))
-            story.append(Spacer(1, 12))
-    
-    # Build the PDF
-    doc.build(story)
+    return hashlib.sha256(cover_letter_text.encode("utf-8")).hexdigest()
+
+
+@st.cache_data(max_entries=PDF_CACHE_MAX_ENTRIES, show_spinner=False)
+def create_cover_letter_pdf_cached(letter_hash, page_size, _cover_letter_text):
+    """
+    Render a cover letter PDF, memoized by (letter hash, page size).
     
-    # Get the PDF data
-    pdf_data = buffer.getvalue()
-    buffer.close()
+    The letter text itself is excluded from Streamlit's argument hashing;
+    letter_hash must be cover_letter_hash() of that text. The applicant's
+    name is not part of the key since the rendered PDF does not include it.
     
-    return pdf_data
+    Args:
+        letter_hash (str): Digest from cover_letter_hash()
+        page_size (str): Key into PAGE_SIZES
+        _cover_letter_text (str): The cover letter content
+        
+    Returns:
+        bytes: PDF file as bytes
+    """
+    return create_cover_letter_pdf(_cover_letter_text, page_size=page_size)
 
 
 def format_filename(applicant_name="Your_Name"):
@@ -110,3 +76,75 @@ def format_filename(applicant_name="Your_Name"):
         clean_name = f"{clean_name}_Cover_Letter"
     
     return f"{clean_name}.pdf"
+
+
+def applicant_name_from_letter(cover_letter_text):
+    """
+    Guess the applicant's name from the first lines of a cover letter.
+    
+    Args:
+        cover_letter_text (str): The cover letter content
+        
+    Returns:
+        str: Name-like line, or "[Your Name]" if none is found
+    """
+    lines = cover_letter_text.split('\n')[:3]
+    for line in lines:
+        if line.strip() and not line.strip().lower().startswith(('dear', 'to whom', 'hiring')):
+            # Try to find a name-like line
+            words = line.strip().split()
+            if 2 <= len(words) <= 4 and not any(word.lower() in ['sincerely', 'regards', 'yours'] for word in words):
+                return line.strip()
+    return "[Your Name]"
+
+
+def _unique_filename(filename, used):
+    """Number repeated filenames: Name_Cover_Letter.pdf, Name_Cover_Letter_2.pdf, ..."""
+    stem, extension = os.path.splitext(filename)
+    candidate = filename
+    counter = 2
+    while candidate in used:
+        candidate = f"{stem}_{counter}{extension}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def export_cover_letters_zip(letters, output, page_size="Letter", workers=EXPORT_WORKERS):
+    """
+    Render many cover letters to PDF and write them into one ZIP archive.
+    
+    Large exports are rendered in the process's shared export pool, whose
+    workers build the styles once; every PDF is written to the archive as
+    soon as it is ready, in input order.
+    
+    Args:
+        letters (list): Cover letters, each a string or a dict with "text" and
+            optionally "applicant_name"
+        output: Writable binary file object (or path) that receives the ZIP
+        page_size (str): Key into PAGE_SIZES
+        workers (int): Maximum worker processes
+        
+    Returns:
+        list: Filenames written to the archive, in input order
+    """
+    jobs = []
+    filenames = []
+    used = set()
+    for item in letters:
+        if isinstance(item, str):
+            item = {"text": item}
+        applicant_name = item.get("applicant_name") or applicant_name_from_letter(item["text"])
+        jobs.append((item["text"], applicant_name, page_size))
+        filenames.append(_unique_filename(format_filename(applicant_name), used))
+    
+    with span("pdf_export", letters=len(jobs), page_size=page_size), zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        if len(jobs) >= EXPORT_PARALLEL_THRESHOLD and workers > 1:
+            pool = get_process_pool("pdf_export", workers)
+            for filename, pdf_data in zip(filenames, pool.imap(render_letter_job, jobs)):
+                archive.writestr(filename, pdf_data)
+        else:
+            for filename, job in zip(filenames, jobs):
+                archive.writestr(filename, render_letter_job(job))
+    
+    return filenames
@@ -0,0 +1,125 @@
+"""
+Cover letter PDF rendering with reportlab.
+
+Kept free of streamlit so export worker processes start quickly (see process_pool).
+"""
+
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.colors import black
+from functools import lru_cache
+from io import BytesIO
+import re
+from instrumentation import span
+
+
+# Supported page sizes for generated PDFs
+PAGE_SIZES = {
+    "Letter": letter,
+    "A4": A4,
+}
+
+PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """
+    Build the paragraph styles once per process.
+    
+    Returns:
+        tuple: (title_style, body_style)
+    """
+    # Get styles
+    styles = getSampleStyleSheet()
+    
+    # Create custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        textColor=black,
+        alignment=1  # Center alignment
+    )
+    
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['Normal'],
+        fontSize=12,
+        spaceAfter=12,
+        leading=14,
+        textColor=black,
+        alignment=0  # Left alignment
+    )
+    
+    return title_style, body_style
+
+
+def create_cover_letter_pdf(cover_letter_text, applicant_name="[Your Name]", page_size="Letter"):
+    """
+    Create a PDF from the cover letter text.
+    
+    Args:
+        cover_letter_text (str): The cover letter content
+        applicant_name (str): Name of the applicant
+        page_size (str): Key into PAGE_SIZES
+        
+    Returns:
+        bytes: PDF file as bytes
+    """
+    # Create a BytesIO buffer to store the PDF
+    buffer = BytesIO()
+    
+    # Create the PDF document
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=PAGE_SIZES.get(page_size, letter),
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=18
+    )
+    
+    # Styles are built once per process
+    title_style, body_style = get_styles()
+    
+    # Build the PDF content
+    story = []
+    
+    # Add title
+    story.append(Paragraph("Cover Letter", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Clean and format the cover letter text
+    # Split by double newlines to preserve paragraph structure
+    paragraphs = PARAGRAPH_SPLIT_RE.split(cover_letter_text.strip())
+    
+    for paragraph in paragraphs:
+        if paragraph.strip():
+            # Clean up the paragraph text
+            clean_paragraph = paragraph.strip().replace('\n', ' ')
+            # Remove excessive whitespace
+            clean_paragraph = WHITESPACE_RE.sub(' ', clean_paragraph)
+            
+            # Add the paragraph to the story
+            story.append(Paragraph(clean_paragraph, body_style))
+            story.append(Spacer(1, 12))
+    
+    # Build the PDF
+    with span("pdf_render", page_size=page_size, paragraphs=len(paragraphs)):
+        doc.build(story)
+    
+    # Get the PDF data
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    
+    return pdf_data
+
+
+def render_letter_job(job):
+    """Render one (text, applicant_name, page_size) export job, e.g. in a worker process."""
+    return create_cover_letter_pdf(*job)
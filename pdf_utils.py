@@ -2,41 +2,237 @@
 PDF parsing utilities for extracting text from CV files.
 """
 
+import hashlib
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
 import PyPDF2
+from contextlib import contextmanager
 from io import BytesIO
 import streamlit as st
+from instrumentation import span
+from pdf_workers import extract_pages
+from process_pool import discard_process_pool, get_process_pool
 
 
-def extract_text_from_pdf(pdf_file):
+# Maximum number of distinct CVs whose extraction results are kept in memory
+CV_CACHE_MAX_ENTRIES = int(os.getenv("CV_CACHE_MAX_ENTRIES", "128"))
+
+# Documents with at least this many pages are extracted in a process pool.
+# A page takes about 7 ms to read, and the pool adds 20-40 ms per document once
+# warm, but starting it costs close to a second, more than reading MAX_PDF_PAGES
+# serially; so extraction is serial unless workers are set.
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "12"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+
+# Seconds to wait for a single page before giving up on it
+PAGE_TIMEOUT_SECONDS = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", "10"))
+
+# Upload limits: larger files are rejected, and only the first pages/characters are read
+MAX_UPLOAD_BYTES = int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+MAX_CV_CHARS = int(os.getenv("PDF_MAX_CV_CHARS", "40000"))
+
+# Uploads above this size are spilled to a temporary file and memory-mapped
+SPILL_THRESHOLD_BYTES = int(os.getenv("PDF_SPILL_THRESHOLD_BYTES", str(2 * 1024 * 1024)))
+SPILL_CHUNK_BYTES = 1024 * 1024
+
+def extract_text_from_pdf(pdf_file, max_pages=MAX_PDF_PAGES, max_chars=MAX_CV_CHARS, raise_errors=False):
     """
     Extract text from an uploaded PDF file.
     
+    Reading stops after max_pages pages or once max_chars characters have
+    been collected, which is far more than a CV needs.
+    
     Args:
-        pdf_file: Streamlit uploaded file object
+        pdf_file: Streamlit uploaded file object, or a binary file opened from disk
+        max_pages (int): Maximum number of pages to read
+        max_chars (int): Maximum number of characters to return
+        raise_errors (bool): Raise on failure, including pages that timed out,
+            instead of reporting the error and returning None or partial text
         
     Returns:
         str: Extracted text from the PDF
     """
     try:
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_file.read()))
-        
-        # Extract text from all pages
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-        
-        # Clean up the text (remove extra whitespace, normalize line breaks)
-        text = " ".join(text.split())
+        with span("pdf_parse") as current:
+            with open_pdf_source(pdf_file) as (stream, worker_source):
+                # Create a PDF reader object
+                pdf_reader = PyPDF2.PdfReader(stream)
+                page_count = min(len(pdf_reader.pages), max_pages)
+                parallel = page_count >= PARALLEL_PAGE_THRESHOLD and PDF_WORKERS > 1
+                current.set(pages=page_count, parallel=parallel)
+                
+                # Extract text page by page, fanning large documents out to worker processes
+                if parallel:
+                    pages = iter_page_texts_parallel(worker_source, page_count)
+                else:
+                    pages = iter_page_texts(pdf_reader, page_count)
+                
+                # Stop early once enough text has been collected
+                collected = []
+                collected_chars = 0
+                timed_out_pages = 0
+                try:
+                    for page_text in pages:
+                        if page_text is None:
+                            timed_out_pages += 1
+                            continue
+                        collected.append(page_text)
+                        collected_chars += len(page_text)
+                        if collected_chars >= max_chars:
+                            break
+                finally:
+                    pages.close()
+                current.set(timed_out_pages=timed_out_pages)
+                if timed_out_pages and raise_errors:
+                    raise TimeoutError(f"A page took longer than {PAGE_TIMEOUT_SECONDS:g} seconds to read")
+            
+            # Join once, then clean up the text (remove extra whitespace, normalize line breaks)
+            text = normalize_text("\n".join(collected))
+            current.set(chars=min(len(text), max_chars))
+            
+            return text[:max_chars]
         
-        return text
-    
     except Exception as e:
+        if raise_errors:
+            raise
         st.error(f"Error reading PDF file: {str(e)}")
         return None
 
 
+@contextmanager
+def open_pdf_source(pdf_file):
+    """
+    Open a PDF for reading without copying large uploads in memory.
+    
+    Files on disk and uploads above SPILL_THRESHOLD_BYTES (spilled to a
+    temporary file in chunks) are read through a read-only memory map, so
+    the pages are paged in by the OS instead of duplicated on the heap.
+    Small uploads are read from memory.
+    
+    Args:
+        pdf_file: Streamlit uploaded file object, or a binary file opened from disk
+        
+    Yields:
+        tuple: (stream, worker_source) where stream is a seekable binary stream
+            for PyPDF2 and worker_source is a file path or bytes that
+            extraction worker processes can open
+            
+    Raises:
+        ValueError: If the file exceeds MAX_UPLOAD_BYTES
+    """
+    if not hasattr(pdf_file, "getbuffer") and hasattr(pdf_file, "fileno"):
+        # Binary file opened from disk: map it directly
+        if os.fstat(pdf_file.fileno()).st_size > MAX_UPLOAD_BYTES:
+            raise ValueError(f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+        with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped, pdf_file.name
+        return
+    
+    # Zero-copy view of in-memory uploads (Streamlit's UploadedFile is a BytesIO)
+    buffer = pdf_file.getbuffer() if hasattr(pdf_file, "getbuffer") else memoryview(pdf_file.read())
+    try:
+        if buffer.nbytes > MAX_UPLOAD_BYTES:
+            raise ValueError(f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+        
+        if buffer.nbytes <= SPILL_THRESHOLD_BYTES:
+            data = bytes(buffer)
+            yield BytesIO(data), data
+            return
+        
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as spill:
+            for offset in range(0, buffer.nbytes, SPILL_CHUNK_BYTES):
+                spill.write(buffer[offset:offset + SPILL_CHUNK_BYTES])
+            spill.flush()
+            with mmap.mmap(spill.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped, spill.name
+    finally:
+        buffer.release()
+
+
+def iter_page_texts(pdf_reader, page_count, page_timeout=PAGE_TIMEOUT_SECONDS):
+    """
+    Yield the text of each page in order.
+    
+    Each page is extracted in a daemon thread so a page that takes longer
+    than page_timeout cannot hold up the caller; it yields None and its
+    thread is left to finish in the background.
+    
+    Args:
+        pdf_reader (PyPDF2.PdfReader): Open PDF reader
+        page_count (int): Number of leading pages to read
+        page_timeout (float): Seconds to wait for each page
+        
+    Yields:
+        str: Text of one page (None if it timed out)
+    """
+    for page_num in range(page_count):
+        result = []
+        worker = threading.Thread(
+            target=lambda page: result.append(page.extract_text() or ""),
+            args=(pdf_reader.pages[page_num],),
+            name="covercraft-pdf-page",
+            daemon=True
+        )
+        worker.start()
+        worker.join(page_timeout)
+        if worker.is_alive():
+            yield None
+            # The stuck thread may still be reading the shared stream
+            return
+        yield result[0] if result else ""
+
+
+def iter_page_texts_parallel(source, page_count, workers=PDF_WORKERS, page_timeout=PAGE_TIMEOUT_SECONDS):
+    """
+    Yield the text of each page in order, extracting pages in a process pool.
+    
+    The pages are split into one contiguous run per worker, and each run is
+    read by a worker of the process's shared extraction pool, which opens
+    the document once for it. A run that takes longer than page_timeout per
+    page yields None and ends the read; the pool is then terminated so the
+    stuck worker stops, and the next document starts a fresh one.
+    
+    Args:
+        source: Path to the PDF file, or its raw bytes
+        page_count (int): Number of leading pages to read
+        workers (int): Number of worker processes
+        page_timeout (float): Seconds to wait for each page
+        
+    Yields:
+        str: Text of one page (None if it timed out)
+    """
+    pool = get_process_pool("pdf_extract", workers)
+    run_length = -(-page_count // workers)
+    runs = [list(range(start, min(start + run_length, page_count))) for start in range(0, page_count, run_length)]
+    results = [pool.apply_async(extract_pages, (source, page_nums)) for page_nums in runs]
+    
+    for page_nums, result in zip(runs, results):
+        try:
+            texts = result.get(timeout=page_timeout * len(page_nums))
+        except multiprocessing.TimeoutError:
+            discard_process_pool(pool)
+            yield None
+            return
+        yield from texts
+
+
+def normalize_text(text):
+    """
+    Collapse all runs of whitespace, including line breaks, into single spaces.
+    
+    Args:
+        text (str): Raw text
+        
+    Returns:
+        str: Normalized text
+    """
+    return " ".join(text.split())
+
+
 def validate_pdf_content(text):
     """
     Validate that the extracted PDF content is meaningful for a CV.
@@ -62,3 +258,41 @@ def validate_pdf_content(text):
     
     # If at least 3 CV-related keywords are found, consider it valid
     return keyword_count >= 3
+
+
+def pdf_digest(pdf_bytes):
+    """
+    Compute a stable content digest for an uploaded PDF.
+    
+    Args:
+        pdf_bytes (bytes-like): Raw bytes of the uploaded file (a memoryview avoids a copy)
+        
+    Returns:
+        str: Hex SHA-256 digest of the file contents
+    """
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+@st.cache_data(max_entries=CV_CACHE_MAX_ENTRIES, show_spinner=False)
+def extract_cv_cached(digest, _pdf_file):
+    """
+    Extract and validate CV text, cached by the digest of the uploaded bytes.
+    
+    The cache is shared across sessions, so re-uploading the same CV or
+    interacting with any widget after upload skips PDF parsing entirely.
+    The raw bytes are excluded from Streamlit's argument hashing; the digest
+    alone identifies the entry. Failed and partial extractions raise, so
+    they are not cached and the next upload of the file tries again.
+    
+    Args:
+        digest (str): Content digest from pdf_digest()
+        _pdf_file: Streamlit uploaded file object
+        
+    Returns:
+        tuple: (extracted_text, is_valid_cv)
+        
+    Raises:
+        Exception: If the PDF cannot be read or a page timed out
+    """
+    text = extract_text_from_pdf(_pdf_file, raise_errors=True)
+    return text, validate_pdf_content(text)
@@ -0,0 +1,29 @@
+"""
+PDF text extraction run in worker processes.
+
+Kept free of streamlit so spawned workers start quickly (see process_pool).
+"""
+
+import mmap
+from io import BytesIO
+import PyPDF2
+
+
+def extract_pages(source, page_nums):
+    """
+    Open a document and extract the text of some of its pages.
+    
+    Args:
+        source: Path to the PDF file (memory-mapped), or its raw bytes
+        page_nums (list): Page indexes to read
+    
+    Returns:
+        list: Text of each page, in the order of page_nums
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            reader = PyPDF2.PdfReader(mapped)
+            return [reader.pages[page_num].extract_text() or "" for page_num in page_nums]
+    
+    reader = PyPDF2.PdfReader(BytesIO(source))
+    return [reader.pages[page_num].extract_text() or "" for page_num in page_nums]
@@ -0,0 +1,52 @@
+"""
+Long-lived worker process pools for CPU-bound PDF work.
+"""
+
+import multiprocessing
+import threading
+
+
+# Workers are spawned rather than forked: forking the multi-threaded Streamlit
+# server can copy a lock held by another thread and deadlock the child
+START_METHOD = "spawn"
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(name, workers):
+    """
+    Get a named worker pool, created on first use and kept for the process.
+    
+    Spawned workers start a fresh interpreter and import the modules of the
+    functions they run, which costs far more than a typical task. Reusing
+    one pool pays that once per process instead of once per request, so the
+    functions sent to it should live in modules that do not import streamlit.
+    
+    Args:
+        name (str): Pool name, e.g. "pdf_extract"
+        workers (int): Number of worker processes
+    
+    Returns:
+        multiprocessing.pool.Pool: Shared pool
+    """
+    with _pools_lock:
+        pool = _pools.get((name, workers))
+        if pool is None:
+            pool = multiprocessing.get_context(START_METHOD).Pool(processes=workers)
+            _pools[(name, workers)] = pool
+        return pool
+
+
+def discard_process_pool(pool):
+    """
+    Terminate a shared pool, e.g. after a task hung, so the next use starts a new one.
+    
+    Args:
+        pool (multiprocessing.pool.Pool): Pool from get_process_pool()
+    """
+    with _pools_lock:
+        for key, shared in list(_pools.items()):
+            if shared is pool:
+                del _pools[key]
+    pool.terminate()
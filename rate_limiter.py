@@ -0,0 +1,503 @@
+"""
+Client-side rate limiting and retries for OpenAI requests.
+"""
+
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+
+# Account quotas per model (0 disables that budget); set them to your OpenAI tier's limits
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+
+# Most requests in flight per model; halved on throttling and grown back one step at a time
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = 1
+
+# Retries of transient failures (429, 5xx, timeouts, dropped connections) with jittered backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+
+# Retries of a timed-out request; each attempt has already waited the full timeout
+LLM_TIMEOUT_RETRIES = int(os.getenv("LLM_TIMEOUT_RETRIES", "1"))
+
+# Status codes worth retrying; other 4xx errors fail the same way again
+RETRYABLE_STATUS_CODES = frozenset((408, 409, 429, 500, 502, 503, 504))
+
+# Throttling within this many seconds counts as one event when shrinking concurrency
+THROTTLE_COOLDOWN_SECONDS = 1.0
+
+# How often async callers re-check for a free slot
+ASYNC_POLL_SECONDS = 0.05
+
+# Shared limiters by model
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def is_transient(error):
+    """
+    Tell whether a failed request may succeed if retried.
+    
+    Args:
+        error (Exception): Error raised by the OpenAI client
+    
+    Returns:
+        bool: True for throttling, server errors, timeouts and connection errors
+    """
+    if isinstance(error, openai.APIStatusError):
+        # An exhausted quota is reported as 429 but does not recover by waiting
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError))
+
+
+def is_timeout(error):
+    """
+    Tell whether a request failed because it timed out.
+    
+    Args:
+        error (Exception): Error raised by the OpenAI client
+    
+    Returns:
+        bool: True for client-side timeouts
+    """
+    return isinstance(error, (openai.APITimeoutError, httpx.TimeoutException))
+
+
+def retry_after_seconds(error):
+    """
+    Read the server's requested wait from a failed response.
+    
+    Args:
+        error (Exception): Error raised by the OpenAI client
+    
+    Returns:
+        float: Seconds to wait from retry-after-ms or Retry-After, or None if absent
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    try:
+        if headers.get("retry-after-ms"):
+            return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            # HTTP-date form
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def message_tokens(message):
+    """
+    Total tokens reported for an LLM response message.
+    
+    Args:
+        message: LangChain AIMessage (or chunk), or a structured output dict with a "raw" message
+    
+    Returns:
+        int: Input plus output tokens, or None if not reported
+    """
+    if isinstance(message, dict):
+        message = message.get("raw")
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return token_usage.get("total_tokens")
+    return None
+
+
+class TokenBucket:
+    """Continuously refilling budget of units per minute."""
+    
+    def __init__(self, per_minute):
+        """
+        Args:
+            per_minute (int): Units replenished per minute, also the bucket size
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0.0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def take(self, amount, now):
+        """Remove units; the level may go negative when actual use exceeded the estimate."""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+    
+    def give(self, amount):
+        """Return units that were reserved but not used."""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Shared request and token budgets with adaptive concurrency.
+    
+    Requests reserve one request and their estimated tokens from token buckets
+    sized to the account's per-minute quotas, and a concurrency slot. Reserved
+    tokens are corrected with the usage the response reports. Throttling
+    (HTTP 429) pauses all callers for the server's Retry-After and halves the
+    concurrency limit; each run of successes grows it back by one slot.
+    """
+    
+    def __init__(self, rpm=OPENAI_RPM_LIMIT, tpm=OPENAI_TPM_LIMIT, max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES):
+        """
+        Args:
+            rpm (int): Requests per minute (0 for no request budget)
+            tpm (int): Tokens per minute (0 for no token budget)
+            max_concurrency (int): Upper bound of requests in flight
+            max_retries (int): Retries of transient failures per call
+        """
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max(max_concurrency, LLM_MIN_CONCURRENCY)
+        self.concurrency = self.max_concurrency
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._last_throttle = 0.0
+        self._condition = threading.Condition()
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0, "wait_s": 0.0}
+    
+    def _try_acquire(self, tokens):
+        """
+        Reserve a slot, one request and the tokens if all are available.
+        
+        Must be called with the condition held.
+        
+        Returns:
+            float: 0.0 if reserved, otherwise seconds to wait before trying again
+                (None when waiting for a slot to be released)
+        """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if self.in_flight >= self.concurrency:
+            return None
+        
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(tokens, now)
+        self.in_flight += 1
+        self.counters["requests"] += 1
+        return 0.0
+    
+    def acquire(self, tokens=0):
+        """
+        Block until a request with the given token estimate may be sent.
+        
+        Args:
+            tokens (int): Estimated prompt plus completion tokens
+        """
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait == 0.0:
+                    break
+                self._condition.wait(timeout=wait)
+            self.counters["wait_s"] += time.monotonic() - started
+    
+    async def aacquire(self, tokens=0):
+        """Async version of acquire() that never blocks the event loop."""
+        started = time.monotonic()
+        while True:
+            with self._condition:
+                wait = self._try_acquire(tokens)
+                if wait == 0.0:
+                    self.counters["wait_s"] += time.monotonic() - started
+                    return
+            await asyncio.sleep(ASYNC_POLL_SECONDS if wait is None else min(wait, 1.0))
+    
+    def release(self, reserved=0, used=None, error=None):
+        """
+        Free the slot of a finished request and record its outcome.
+        
+        Args:
+            reserved (int): Tokens reserved by acquire()
+            used (int): Tokens the response reported, if known
+            error (Exception): Error the request failed with, if any
+        """
+        # Requests the server rejected with a status code did not use tokens
+        if used is None and isinstance(error, openai.APIStatusError):
+            used = 0
+        
+        with self._condition:
+            self.in_flight -= 1
+    
+            if self.tokens is not None and used is not None:
+                if used < reserved:
+                    self.tokens.give(reserved - used)
+                else:
+                    self.tokens.take(used - reserved, time.monotonic())
+            
+            if error is None:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            elif getattr(error, "status_code", None) == 429:
+                self._throttled(retry_after_seconds(error))
+            
+            self._condition.notify_all()
+    
+    def _throttled(self, retry_after):
+        """Pause everyone for Retry-After and shrink the concurrency limit (condition held)."""
+        now = time.monotonic()
+        self.counters["throttled"] += 1
+        self._successes = 0
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self._last_throttle >= THROTTLE_COOLDOWN_SECONDS:
+            self.concurrency = max(LLM_MIN_CONCURRENCY, self.concurrency // 2)
+            self._last_throttle = now
+    
+    def retry_delay(self, error, attempt, retries=None, timeout_retries=None):
+        """
+        Seconds to wait before retrying a failed request.
+        
+        Args:
+            error (Exception): Error the attempt failed with
+            attempt (int): Number of the failed attempt, from 0
+            retries (int): Retries allowed for this call (defaults to max_retries)
+            timeout_retries (int): Retries allowed when the attempt timed out
+                (defaults to LLM_TIMEOUT_RETRIES)
+        
+        Returns:
+            float: Delay, or None if the error should not be retried
+        """
+        if attempt >= (self.max_retries if retries is None else retries) or not is_transient(error):
+            return None
+        if is_timeout(error) and attempt >= (LLM_TIMEOUT_RETRIES if timeout_retries is None else timeout_retries):
+            return None
+        
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Waiting longer than the cap would leave the user staring at a spinner
+            if retry_after > LLM_RETRY_MAX_DELAY:
+                return None
+            return retry_after + random.uniform(0, LLM_RETRY_BASE_DELAY)
+        
+        # Full jitter keeps retrying clients from hitting the server in lockstep
+        return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+    
+    def _record_failure(self, current_span, attempts):
+        with self._condition:
+            self.counters["failed"] += 1
+        if current_span is not None:
+            current_span.set(attempts=attempts)
+    
+    def call(self, func, tokens=0, usage=message_tokens, current_span=None, retries=None, timeout_retries=None):
+        """
+        Run a request within the budgets, retrying transient failures.
+        
+        Args:
+            func (callable): Sends the request and returns the response
+            tokens (int): Estimated prompt plus completion tokens
+            usage (callable): Returns the tokens a response used, or None
+            current_span (Span): Span that receives the number of attempts
+            retries (int): Retries allowed for this call (defaults to max_retries)
+            timeout_retries (int): Retries allowed after a timeout (defaults to LLM_TIMEOUT_RETRIES)
+        
+        Returns:
+            The response of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = func()
+            except Exception as e:
+                self.release(tokens, error=e)
+                delay = self.retry_delay(e, attempt, retries, timeout_retries)
+                if delay is None:
+                    self._record_failure(current_span, attempt + 1)
+                    raise
+                self._count_retry()
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            self.release(tokens, used=usage(result))
+            if current_span is not None:
+                current_span.set(attempts=attempt + 1)
+            return result
+    
+    async def acall(self, func, tokens=0, usage=message_tokens, current_span=None, retries=None, timeout_retries=None):
+        """
+        Async version of call().
+        
+        Args:
+            func (callable): Returns an awaitable that sends the request
+            tokens (int): Estimated prompt plus completion tokens
+            usage (callable): Returns the tokens a response used, or None
+            current_span (Span): Span that receives the number of attempts
+            retries (int): Retries allowed for this call (defaults to max_retries)
+            timeout_retries (int): Retries allowed after a timeout (defaults to LLM_TIMEOUT_RETRIES)
+        
+        Returns:
+            The response of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            await self.aacquire(tokens)
+            try:
+                result = await func()
+            except Exception as e:
+                self.release(tokens, error=e)
+                delay = self.retry_delay(e, attempt, retries, timeout_retries)
+                if delay is None:
+                    self._record_failure(current_span, attempt + 1)
+                    raise
+                self._count_retry()
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            
+            self.release(tokens, used=usage(result))
+            if current_span is not None:
+                current_span.set(attempts=attempt + 1)
+            return result
+    
+    def stream(self, func, tokens=0, current_span=None, retries=None, timeout_retries=None):
+        """
+        Stream a response within the budgets.
+        
+        Failures before the first chunk are retried like call(); once chunks
+        have been yielded, errors are raised to the caller.
+        
+        Args:
+            func (callable): Starts the request and returns an iterator of chunks
+            tokens (int): Estimated prompt plus completion tokens
+            current_span (Span): Span that receives the number of attempts
+            retries (int): Retries allowed for this call (defaults to max_retries)
+            timeout_retries (int): Retries allowed after a timeout (defaults to LLM_TIMEOUT_RETRIES)
+        
+        Yields:
+            Chunks of the response
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            started = False
+            used = None
+            chunks = None
+            try:
+                chunks = func()
+                for chunk in chunks:
+                    started = True
+                    used = message_tokens(chunk) or used
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped early: close the HTTP stream and free the slot
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+                self.release(tokens, used=used)
+                raise
+            except Exception as e:
+                self.release(tokens, error=e)
+                delay = None if started else self.retry_delay(e, attempt, retries, timeout_retries)
+                if delay is None:
+                    self._record_failure(current_span, attempt + 1)
+                    raise
+                self._count_retry()
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            self.release(tokens, used=used)
+            if current_span is not None:
+                current_span.set(attempts=attempt + 1)
+            return
+    
+    def _count_retry(self):
+        with self._condition:
+            self.counters["retries"] += 1
+    
+    def stats(self):
+        """
+        Get the limiter's current state and counters.
+        
+        Returns:
+            dict: Concurrency limit, requests in flight, remaining budgets and totals
+        """
+        with self._condition:
+            now = time.monotonic()
+            stats = dict(self.counters, concurrency=self.concurrency, in_flight=self.in_flight)
+            stats["wait_s"] = round(stats["wait_s"], 3)
+            stats["paused_s"] = round(max(self.paused_until - now, 0.0), 3)
+            for name, bucket in (("requests_available", self.requests), ("tokens_available", self.tokens)):
+                if bucket is not None:
+                    bucket._refill(now)
+                    stats[name] = int(bucket.level)
+            return stats
+
+
+def get_rate_limiter(model):
+    """
+    Get the process-wide limiter for a model; OpenAI quotas are per model.
+    
+    Args:
+        model (str): OpenAI chat model name
+    
+    Returns:
+        RateLimiter: Shared limiter configured from the environment
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter()
+        return _limiters[model]
+
+
+def limiter_stats():
+    """
+    Get the state of every limiter created in this process.
+    
+    Returns:
+        dict: RateLimiter.stats() per model
+    """
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
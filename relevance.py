@@ -0,0 +1,237 @@
+"""
+Local lexical relevance scoring between a CV and job descriptions.
+"""
+
+import re
+
+import numpy as np
+
+from pdf_utils import normalize_text
+
+
+# Terms that carry no matching signal
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can do for from has have i in is it its of on or our that the their them
+they this to was we were will with you your about all also any into more most not other over such than
+then these those through under up very what when where which who within without would should could may
+must us etc e.g i.e per via
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# Sentence boundaries (including bullet points) used to cut text into passages
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;•])\s+|\s+(?=[•▪●-]\s)")
+
+# Coverage thresholds for the 2-5 star preliminary score (below the first is 1 star)
+COVERAGE_STAR_THRESHOLDS = (0.2, 0.35, 0.5, 0.65)
+
+
+def tokenize(text):
+    """
+    Split text into lowercase terms, keeping tokens like "c++", "c#" and "node.js".
+    
+    Args:
+        text (str): Input text
+    
+    Returns:
+        list: Terms with stop words removed
+    """
+    terms = (token.rstrip(".") for token in TOKEN_RE.findall(normalize_text(text).lower()))
+    return [term for term in terms if term and term not in STOP_WORDS]
+
+
+class RelevanceIndex:
+    """Incremental BM25 index over job descriptions."""
+    
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        Initialize an empty index.
+        
+        Args:
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.vocabulary = {}
+        
+        # Postings in coordinate form: one entry per (document, term) pair
+        self._posting_docs = []
+        self._posting_terms = []
+        self._posting_freqs = []
+        self._doc_lengths = []
+        self._arrays = None
+    
+    def __len__(self):
+        return len(self.doc_ids)
+    
+    def add(self, doc_id, text):
+        """
+        Add a document to the index.
+        
+        Args:
+            doc_id: Identifier returned by rank()
+            text (str): Document text
+        """
+        terms = tokenize(text)
+        term_ids, freqs = np.unique(
+            np.fromiter((self.vocabulary.setdefault(term, len(self.vocabulary)) for term in terms), dtype=np.int64, count=len(terms)),
+            return_counts=True
+        )
+        
+        doc_index = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self._doc_lengths.append(len(terms))
+        self._posting_docs.append(np.full(len(term_ids), doc_index, dtype=np.int64))
+        self._posting_terms.append(term_ids)
+        self._posting_freqs.append(freqs.astype(np.float64))
+        self._arrays = None
+    
+    def _postings(self):
+        """
+        Get the postings as contiguous arrays, rebuilding them after additions.
+        
+        Returns:
+            tuple: (docs, terms, freqs, doc_lengths, doc_freqs) NumPy arrays
+        """
+        if self._arrays is None:
+            docs = np.concatenate(self._posting_docs) if self._posting_docs else np.zeros(0, dtype=np.int64)
+            terms = np.concatenate(self._posting_terms) if self._posting_terms else np.zeros(0, dtype=np.int64)
+            freqs = np.concatenate(self._posting_freqs) if self._posting_freqs else np.zeros(0)
+            
+            # Compact the per-document chunks so later rebuilds only concatenate new ones
+            self._posting_docs, self._posting_terms, self._posting_freqs = [docs], [terms], [freqs]
+            
+            doc_freqs = np.bincount(terms, minlength=len(self.vocabulary))
+            self._arrays = (docs, terms, freqs, np.asarray(self._doc_lengths, dtype=np.float64), doc_freqs)
+        return self._arrays
+    
+    def scores(self, query):
+        """
+        Compute BM25 scores of every indexed document for a query.
+        
+        Args:
+            query (str): Query text, typically the CV
+        
+        Returns:
+            numpy.ndarray: One score per document, in insertion order
+        """
+        if not self.doc_ids:
+            return np.zeros(0)
+        
+        docs, terms, freqs, doc_lengths, doc_freqs = self._postings()
+        query_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not query_ids:
+            return np.zeros(len(self.doc_ids))
+        
+        n_docs = len(self.doc_ids)
+        query_mask = np.zeros(len(self.vocabulary), dtype=bool)
+        query_mask[query_ids] = True
+        
+        selected = query_mask[terms]
+        docs, terms, freqs = docs[selected], terms[selected], freqs[selected]
+        
+        idf = np.log1p((n_docs - doc_freqs[terms] + 0.5) / (doc_freqs[terms] + 0.5))
+        length_norm = 1 - self.b + self.b * doc_lengths[docs] / max(doc_lengths.mean(), 1.0)
+        contributions = idf * freqs * (self.k1 + 1) / (freqs + self.k1 * length_norm)
+        
+        return np.bincount(docs, weights=contributions, minlength=n_docs)
+    
+    def rank(self, query, top_k=None):
+        """
+        Rank indexed documents by relevance to a query.
+        
+        Args:
+            query (str): Query text, typically the CV
+            top_k (int): Number of results to return (all if None)
+        
+        Returns:
+            list: (doc_id, score) tuples, best first
+        """
+        scores = self.scores(query)
+        if top_k is not None and top_k < len(scores):
+            order = np.argpartition(-scores, top_k)[:top_k]
+            order = order[np.argsort(-scores[order], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        return [(self.doc_ids[i], float(scores[i])) for i in order]
+
+
+def preliminary_score(cv_text, job_description):
+    """
+    Estimate the CV match instantly from keyword coverage.
+    
+    Coverage is the share of distinct job description terms that also occur in
+    the CV, with longer, more specific terms weighted higher than short ones.
+    
+    Args:
+        cv_text (str): Extracted CV text
+        job_description (str): Job description text
+    
+    Returns:
+        dict: "coverage" (0.0 to 1.0), "score" (1 to 5) and "stars"
+    """
+    job_terms = np.array(sorted(set(tokenize(job_description))))
+    if job_terms.size == 0:
+        return {"coverage": 0.0, "score": 1, "stars": "⭐"}
+    
+    cv_terms = np.array(sorted(set(tokenize(cv_text))))
+    weights = np.log1p(np.char.str_len(job_terms))
+    matched = np.isin(job_terms, cv_terms)
+    coverage = float(weights[matched].sum() / weights.sum())
+    
+    score = 1 + int(np.searchsorted(COVERAGE_STAR_THRESHOLDS, coverage, side="right"))
+    return {"coverage": coverage, "score": score, "stars": "⭐" * score}
+
+
+def split_passages(text, passage_words=50):
+    """
+    Cut text into passages of whole sentences of about passage_words words.
+    
+    Args:
+        text (str): Input text, e.g. the whitespace-collapsed CV
+        passage_words (int): Target passage length in words
+    
+    Returns:
+        list: Passages in document order
+    """
+    passages = []
+    current = []
+    current_words = 0
+    for sentence in SENTENCE_SPLIT_RE.split(normalize_text(text)):
+        words = len(sentence.split())
+        if current and current_words + words > passage_words:
+            passages.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(sentence)
+        current_words += words
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def relevant_passages(text, query, top_k=3, passage_words=50):
+    """
+    Select the passages of a text most relevant to a query with BM25.
+    
+    Args:
+        text (str): Text to select from, typically the CV
+        query (str): What the passages should be about
+        top_k (int): Number of passages to return
+        passage_words (int): Target passage length in words
+    
+    Returns:
+        str: Selected passages in document order, separated by " ... "
+    """
+    passages = split_passages(text, passage_words)
+    if len(passages) <= top_k:
+        return " ... ".join(passages)
+    
+    index = RelevanceIndex()
+    for position, passage in enumerate(passages):
+        index.add(position, passage)
+    
+    selected = sorted(position for position, _ in index.rank(query, top_k=top_k))
+    return " ... ".join(passages[position] for position in selected)
+
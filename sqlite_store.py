@@ -0,0 +1,47 @@
+"""
+Shared connection handling of the SQLite-backed stores.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base of the stores kept in a WAL-mode SQLite database, with one connection per thread."""
+    
+    def __init__(self, path):
+        """
+        Open the database, creating its directory if needed.
+        
+        Subclasses create their tables after calling this.
+        
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._connect().execute("PRAGMA journal_mode=WAL")
+    
+    def _connect(self):
+        """
+        Get this thread's connection to the database.
+        
+        SQLite connections must not be shared across threads, so each
+        Streamlit session thread gets its own; WAL mode plus the busy
+        timeout lets concurrent sessions read and write safely.
+        
+        Returns:
+            sqlite3.Connection: Connection in autocommit mode
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,181 @@
+"""
+Token counting and input budgeting for LLM prompts.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+import tiktoken
+
+
+# Maximum number of input tokens per prompt (instructions + CV + job description)
+INPUT_TOKEN_BUDGET = int(os.getenv("INPUT_TOKEN_BUDGET", "6000"))
+
+# Share of the variable-content budget reserved for the CV when both inputs are too long
+CV_BUDGET_SHARE = 0.6
+
+# Segments that carry little signal for matching or writing and are dropped first
+BOILERPLATE_PATTERNS = [
+    r"equal (employment )?opportunity",
+    r"\beeo\b",
+    r"regardless of (race|age|gender|sex|religion)",
+    r"reasonable accommodation",
+    r"(privacy|cookie) (policy|notice|settings)",
+    r"accept (all )?cookies",
+    r"apply (now|today|here)",
+    r"click here",
+    r"share (this|on) (job|linkedin|facebook|twitter)",
+    r"(similar|related|recommended) jobs",
+    r"all rights reserved",
+    r"references (are )?available (up)?on request",
+    r"recruitment agencies",
+]
+BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+# Line breaks, or sentence ends followed by whitespace for whitespace-collapsed text
+SEGMENT_SPLIT_RE = re.compile(r"\n+|(?<=[.!?•|])\s+")
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model):
+    """
+    Get the tiktoken encoding for a model.
+    
+    Args:
+        model (str): OpenAI model name
+    
+    Returns:
+        tiktoken.Encoding: Encoding, or None if it cannot be loaded
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encoding files unavailable (e.g. offline); fall back to estimates
+        return None
+
+
+def count_tokens(text, model):
+    """
+    Count the tokens in a piece of text.
+    
+    Args:
+        text (str): Text to count
+        model (str): OpenAI model name
+    
+    Returns:
+        int: Token count (estimated at ~4 characters per token if no encoding is available)
+    """
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model):
+    """
+    Truncate text to at most max_tokens tokens.
+    
+    Args:
+        text (str): Text to truncate
+        max_tokens (int): Token limit
+        model (str): OpenAI model name
+    
+    Returns:
+        str: Truncated text
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def compact_text(text):
+    """
+    Remove duplicate and boilerplate segments while preserving order.
+    
+    Args:
+        text (str): CV or job description text
+    
+    Returns:
+        str: Compacted text
+    """
+    seen = set()
+    kept = []
+    separator = "\n" if "\n" in text else " "
+    
+    for segment in SEGMENT_SPLIT_RE.split(text):
+        segment = segment.strip()
+        if not segment:
+            continue
+        
+        # Normalize case, punctuation and whitespace to catch repeated blocks
+        fingerprint = " ".join(re.sub(r"[^\w\s]", " ", segment.lower()).split())
+        if not fingerprint or fingerprint in seen or BOILERPLATE_RE.search(segment):
+            continue
+        
+        seen.add(fingerprint)
+        kept.append(segment)
+    
+    return separator.join(kept)
+
+
+def fit_to_budget(components, budget=INPUT_TOKEN_BUDGET, model="gpt-4o-mini", overhead_tokens=0):
+    """
+    Compact the CV and job description so the prompt fits an input token budget.
+    
+    Inputs that already fit are returned unchanged. Otherwise both are
+    compacted (deduplicated, boilerplate removed) and, if still too long,
+    truncated to their share of the remaining budget.
+    
+    Args:
+        components (dict): {"cv_content": str, "job_description": str}
+        budget (int): Maximum input tokens for the whole prompt
+        model (str): OpenAI model name used for counting
+        overhead_tokens (int): Tokens used by the fixed prompt instructions
+    
+    Returns:
+        tuple: (fitted_components, report) where report holds the budget and
+            per-component token counts "before" and "after" compaction
+    """
+    before = {name: count_tokens(text, model) for name, text in components.items()}
+    before["instructions"] = overhead_tokens
+    before["total"] = sum(before.values())
+    
+    report = {"budget": budget, "before": before, "after": before, "compacted": False}
+    if before["total"] <= budget:
+        return dict(components), report
+    
+    fitted = {name: compact_text(text) for name, text in components.items()}
+    counts = {name: count_tokens(text, model) for name, text in fitted.items()}
+    
+    available = max(0, budget - overhead_tokens)
+    if sum(counts.values()) > available:
+        # Give the CV its share, letting either side use what the other leaves unused
+        cv_limit = int(available * CV_BUDGET_SHARE)
+        jd_limit = available - cv_limit
+        if counts["cv_content"] < cv_limit:
+            jd_limit = available - counts["cv_content"]
+        elif counts["job_description"] < jd_limit:
+            cv_limit = available - counts["job_description"]
+        
+        limits = {"cv_content": cv_limit, "job_description": jd_limit}
+        for name, limit in limits.items():
+            if counts[name] > limit:
+                fitted[name] = truncate_to_tokens(fitted[name], limit, model)
+                counts[name] = count_tokens(fitted[name], model)
+    
+    after = dict(counts)
+    after["instructions"] = overhead_tokens
+    after["total"] = sum(after.values())
+    report.update(after=after, compacted=True)
+    return fitted, report